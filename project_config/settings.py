@@ -141,3 +141,52 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Shared cache
+# Job state and cache invalidations must be seen by every worker process and
+# by manage.py commands, so the cache lives in the database.
+# Create its table with `python manage.py createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'storytracker_cache',
+    }
+}
+
+
+# Story generation jobs
+# Job state is kept in the shared cache, so any process can answer a poll
+
+STORY_JOB_WORKERS = int(os.getenv('STORY_JOB_WORKERS', 2))  # Worker threads per process
+STORY_JOB_MAX_RUNNING = int(os.getenv('STORY_JOB_MAX_RUNNING', 2))  # Jobs running at once across all processes
+STORY_JOB_TTL = 600  # Seconds a job's state is kept after its last update
+STORY_JOB_UPDATE_INTERVAL = 0.5  # Seconds between partial background updates while a job streams
+
+
+# Club background generation
+
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://192.168.0.107:1234/v1')
+LLM_API_KEY = os.getenv('LLM_API_KEY', 'lm-studio')
+LLM_MODEL = os.getenv('LLM_MODEL', 'your-model')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 120))  # Seconds per request to the model server
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))  # Retries with exponential backoff
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 2))  # In-flight requests per process
+LLM_THINK_TAGS = os.getenv('LLM_THINK_TAGS', 'false').lower() == 'true'  # Set true when the chat template adds the opening <think>, so only </think> is streamed
+
+BACKGROUND_CACHE_TTL = 30 * 24 * 60 * 60  # Seconds before a cached background is regenerated
+BACKGROUND_CACHE_VARIANTS = int(os.getenv('BACKGROUND_CACHE_VARIANTS', 1))  # Backgrounds kept per club
+BACKGROUND_CACHE_LRU_SIZE = 256  # Clubs held in the in-process cache
+
+CLUB_INDEX_TTL = 300  # Seconds before the random club id index is reloaded
+
+SHARED_VERSION_CHECK_INTERVAL = 1  # Seconds between checks that an in-process index is still current
+
+SQUAD_CACHE_TTL = 300  # Seconds a club squad is served from the in-process cache
+SQUAD_CACHE_SIZE = 512  # Club squads (per position filter) held in the cache
+
+PLAYER_INDEX_TTL = 600  # Seconds before the in-process player search index is rebuilt
+PLAYER_INDEX_REBUILD_INTERVAL = 5  # Minimum seconds between background rebuilds of the search index
+
+STORY_LISTS_RELOAD_INTERVAL = 60  # Seconds between mtime checks of the formation/challenge lists
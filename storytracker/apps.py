@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StorytrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'storytracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401 Registers signal handlers
+        from .utils.story_generator import preload_item_lists
+        preload_item_lists()
@@ -1,123 +1,119 @@
 from django.core.management.base import BaseCommand
 import pandas as pd
 from storytracker.models import Club, Competition
+from storytracker.utils import club_index
+from storytracker.utils.csv_pipeline import read_frame_batches, run_pipeline
 from django.utils.text import slugify
 
+# CSV column -> Club field
+CLUB_COLUMNS = {
+    'Club': 'name',
+    'Country': 'country',
+    'Club Logo Small': 'club_logo_small_url',
+    'Club Logo Big': 'club_logo_big_url',
+    'Overall': 'overall',
+    'ATT': 'att_rating',
+    'MID': 'mid_rating',
+    'DEF': 'def_rating',
+    'Dom. Prestige': 'dom_prestige',
+    "Int'l Prestige": 'intl_prestige',
+    'League Rep': 'league_rep',
+    'Scout Region': 'scout_region',
+    'Youth Scouting Region': 'youth_scouting_region',
+}
+
 class Command(BaseCommand):
     help = 'Import clubs from CSV file'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
         parser.add_argument('--create-competitions', action='store_true', help='Create competitions if they do not exist')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows parsed and committed per batch')
 
     def handle(self, *args, **kwargs):
-        csv_file = kwargs['csv_file']
         create_competitions = kwargs.get('create_competitions', False)
-        
-        try:
-            # Read CSV file
-            df = pd.read_csv(csv_file)
-            
-            clubs_created = 0
-            clubs_skipped = 0
-            competitions_created = 0
-            
-            # First, ensure all competitions exist
-            if create_competitions:
-                unique_leagues = df[['League ID', 'League', 'Country', 'League Rep']].drop_duplicates()
-                for _, row in unique_leagues.iterrows():
-                    try:
-                        comp = Competition.objects.filter(name=row['League']).first()
-                        if not comp:
-                            comp = Competition(
-                                name=row['League'],
-                                country=row['Country'],
-                                tier=row['League ID'],
-                                league_rep=row['League Rep'],
-                                competition_type='LEAGUE', # Default value
-                                slug=slugify(row['League'])
-                            )
-                            comp.save()
-                            competitions_created += 1
-                            self.stdout.write(
-                                self.style.SUCCESS(f"Created competition: {comp.name}")
-                            )
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f"Error creating competition '{row['League']}': {str(e)}")
-                        )
-            
-            # Then import clubs
-            for _, row in df.iterrows():
-                try:
-                    # Try to get the competition for this club
-                    try:
-                        competition = Competition.objects.get(name=row['League'])
-                    except Competition.DoesNotExist:
-                        self.stdout.write(
-                            self.style.WARNING(f"Competition '{row['League']}' not found, skipping club '{row['Club']}'")
-                        )
-                        continue
-                    
-                    # Check if club already exists
-                    if Club.objects.filter(name=row['Club']).exists():
-                        self.stdout.write(
-                            self.style.WARNING(f"Club '{row['Club']}' already exists, skipping")
-                        )
-                        clubs_skipped += 1
-                        continue
-                    
-                    # Default values for required fields that might be null in CSV
-                    scout_region = row['Scout Region'] if 'Scout Region' in row and not pd.isna(row['Scout Region']) else row['Country']
-                    youth_region = row['Youth Scouting Region'] if 'Youth Scouting Region' in row and not pd.isna(row['Youth Scouting Region']) else row['Country']
-                    
-                    # Create new club with fields from the CSV
-                    club = Club(
-                        name=row['Club'],
-                        league=competition,
-                        country=row['Country'],
-                        club_logo_small_url=row['Club Logo Small'],
-                        club_logo_big_url=row['Club Logo Big'],
-                        overall=row['Overall'],
-                        att_rating=row['ATT'],
-                        mid_rating=row['MID'],
-                        def_rating=row['DEF'],
-                        dom_prestige=row['Dom. Prestige'],
-                        intl_prestige=row["Int'l Prestige"],
-                        league_rep=row['League Rep'],
-                        scout_region=scout_region,
-                        youth_scouting_region=youth_region
-                    )
-                    
-                    # Add international competition if available
-                    if "Int'l Comp" in row and not pd.isna(row["Int'l Comp"]):
-                        club.international_competition = row["Int'l Comp"]
-                    
-                    # Generate slug
-                    club.slug = slugify(club.name)
-                    
-                    # Save the club
-                    club.save()
-                    clubs_created += 1
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Imported club: {club.name} ({competition.name})")
-                    )
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Error importing club '{row['Club']}': {str(e)}")
-                    )
-            
-            self.stdout.write(
-                self.style.SUCCESS(f"\nClubs import summary: {clubs_created} created, {clubs_skipped} skipped")
+
+        # Kept across batches so repeats in later batches are still caught
+        competition_ids = dict(Competition.objects.values_list('name', 'id'))
+        existing_clubs = set(Club.objects.values_list('name', flat=True))
+        missing_leagues = set()
+        competitions_created = 0
+
+        def create_missing_competitions(df):
+            nonlocal competitions_created
+            leagues = df[['League ID', 'League', 'Country', 'League Rep']].drop_duplicates('League')
+            new_leagues = leagues[~leagues['League'].isin(list(competition_ids))]
+            if new_leagues.empty:
+                return
+            Competition.objects.bulk_create([
+                Competition(
+                    name=league['League'],
+                    country=league['Country'],
+                    tier=league['League ID'],
+                    league_rep=league['League Rep'],
+                    competition_type='LEAGUE', # Default value
+                    min_wage_budget=0,
+                    slug=slugify(league['League'])
+                )
+                for league in new_leagues.to_dict('records')
+            ], ignore_conflicts=True)
+            competitions_created += len(new_leagues)
+            # ignore_conflicts leaves pks unset, so read the ids back
+            competition_ids.update(
+                Competition.objects.filter(name__in=list(new_leagues['League'])).values_list('name', 'id')
             )
+
+        def parse(df, stats):
             if create_competitions:
+                create_missing_competitions(df)
+
+            # Default values for required fields that might be null in CSV
+            for column in ('Scout Region', 'Youth Scouting Region'):
+                df[column] = df[column].fillna(df['Country']) if column in df else df['Country']
+
+            # Resolve each club's competition with a single merge
+            competitions = pd.DataFrame(list(competition_ids.items()), columns=['League', 'league_id'])
+            df = df.merge(competitions, on='League', how='left')
+
+            missing = df['league_id'].isna()
+            for league in set(df.loc[missing, 'League'].unique()) - missing_leagues:
+                missing_leagues.add(league)
                 self.stdout.write(
-                    self.style.SUCCESS(f"Competitions created: {competitions_created}")
+                    self.style.WARNING(f"Competition '{league}' not found, skipping its clubs")
                 )
-            
+
+            # Skip clubs that already exist or repeat within the file
+            duplicate = df['Club'].isin(existing_clubs) | df.duplicated('Club')
+            stats.skipped += int((missing | duplicate).sum())
+
+            new_clubs = df.loc[~missing & ~duplicate, list(CLUB_COLUMNS) + ['league_id']]
+            new_clubs = new_clubs.rename(columns=CLUB_COLUMNS).astype({'league_id': int})
+            # Convert to Python objects so missing logos become None rather than NaN
+            return new_clubs.astype(object).where(new_clubs.notna(), None)
+
+        def write(new_clubs, stats):
+            clubs = [Club(**club) for club in new_clubs.to_dict('records')]
+            Club.objects.bulk_create(clubs, ignore_conflicts=True)
+            existing_clubs.update(club.name for club in clubs)
+            stats.created += len(clubs)
+
+        try:
+            stats = run_pipeline(read_frame_batches(kwargs['csv_file'], kwargs['batch_size']), parse, write)
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f"Error reading CSV file: {str(e)}")
-            )
\ No newline at end of file
+                self.style.ERROR(f"Error importing clubs: {str(e)}")
+            )
+            return
+        finally:
+            # bulk_create sends no signals, so refresh the random club index by hand
+            club_index.invalidate()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nClubs import summary: {stats.summary()}, {len(missing_leagues)} competitions not found"
+            )
+        )
+        if create_competitions:
+            self.stdout.write(
+                self.style.SUCCESS(f"Competitions created: {competitions_created}")
+            )
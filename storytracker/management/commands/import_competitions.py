@@ -1,60 +1,80 @@
+from decimal import Decimal
 from django.core.management.base import BaseCommand
 import pandas as pd
 from storytracker.models import Competition
+from storytracker.utils.csv_pipeline import read_frame_batches, run_pipeline
 from django.utils.text import slugify
 
+# Fields compared against the database to decide whether a row changed
+UPSERT_FIELDS = [
+    'competition_type', 'country', 'logo_url', 'league_rep', 'tier',
+    'min_wage_budget', 'slug',
+]
+
+def parse_competitions(df, stats):
+    """Parse stage: map CSV columns to Competition fields for a batch"""
+    df = df.drop_duplicates('League', keep='last')
+
+    # Handle empty wage budgets
+    min_wage = pd.to_numeric(df['Minimum Wage Budgets'], errors='coerce').fillna(0)
+    df = pd.DataFrame({
+        'name': df['League'],
+        'competition_type': df['competition_type'].str.upper(),
+        'country': df['Country'],
+        'logo_url': df['Image Link'],
+        'league_rep': df['League Rep'],
+        'tier': df['Tier'],
+        'min_wage_budget': min_wage.map(lambda wage: Decimal(str(round(wage, 2)))),
+        'slug': df['League'].map(slugify),
+    })
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def write_competitions(rows, stats):
+    """Writer stage: diff a batch against the database and write only changes"""
+    existing = {
+        competition.name: competition
+        for competition in Competition.objects.filter(name__in=[row['name'] for row in rows])
+    }
+
+    to_create = []
+    to_update = []
+    for row in rows:
+        competition = existing.get(row['name'])
+        if competition is None:
+            to_create.append(Competition(**row))
+            continue
+        if all(getattr(competition, field) == row[field] for field in UPSERT_FIELDS):
+            stats.unchanged += 1
+            continue
+        for field in UPSERT_FIELDS:
+            setattr(competition, field, row[field])
+        to_update.append(competition)
+
+    Competition.objects.bulk_create(to_create)
+    Competition.objects.bulk_update(to_update, UPSERT_FIELDS)
+    stats.created += len(to_create)
+    stats.updated += len(to_update)
+
 class Command(BaseCommand):
-    help = 'Import competitions from CSV file'
+    help = 'Import competitions from CSV file, updating existing ones by name'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows parsed and committed per batch')
 
     def handle(self, *args, **kwargs):
-        csv_file = kwargs['csv_file']
-        
         try:
-            # Read CSV file with proper column names
-            df = pd.read_csv(csv_file)
-            
-            competitions_created = 0
-            
-            for _, row in df.iterrows():
-                try:
-                    # Handle empty wage budgets
-                    min_wage = pd.to_numeric(row['Minimum Wage Budgets'], errors='coerce')
-                    min_wage = 0 if pd.isna(min_wage) else min_wage
-
-                    competition = Competition(
-                        name=row['League'],
-                        competition_type=row['competition_type'].upper(),
-                        country=row['Country'],
-                        logo_url=row['Image Link'],
-                        league_rep=row['League Rep'],
-                        tier=row['Tier'],
-                        min_wage_budget=min_wage
-                    )
-                    
-                    # Generate slug
-                    competition.slug = slugify(competition.name)
-                    
-                    # Save the competition
-                    competition.save()
-                    competitions_created += 1
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Imported: {competition.name} ({competition.country})')
-                    )
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error importing competition {row["League"]}: {str(e)}')
-                    )
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'\nSuccessfully imported {competitions_created} competitions')
+            stats = run_pipeline(
+                read_frame_batches(kwargs['csv_file'], kwargs['batch_size']),
+                parse_competitions,
+                write_competitions,
             )
-            
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f'Error reading CSV file: {str(e)}')
-            )
\ No newline at end of file
+                self.style.ERROR(f'Error importing competitions: {str(e)}')
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompetitions import summary: {stats.summary()}')
+        )
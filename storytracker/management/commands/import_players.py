@@ -1,120 +1,255 @@
-import csv
+import hashlib
 from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 from django.utils.text import slugify
 from storytracker.models import Player, Club
+from storytracker.utils import player_index, squad_cache
+from storytracker.utils.csv_pipeline import (
+    ImportStats, RowValidationError, bulk_update_values, read_csv_batches, parse_rows, run_pipeline,
+)
+
+IMPORT_SOURCE = "FC25_CSV_IMPORT"
+
+# Fields rewritten when an existing player is imported again
+UPDATE_FIELDS = [
+    'name', 'slug', 'positions', 'nationality', 'birth_date', 'birth_year',
+    'age', 'face_pic_url', 'club', 'wage_eur', 'wage_usd', 'wage_gbp',
+    'contract_start', 'contract_end', 'contract_loan', 'overall', 'potential',
+    'import_source', 'import_hash', 'last_import_date',
+]
+
+# Columns PlayerRowParser reads, and those that must not be blank
+CSV_COLUMNS = [
+    'Player ID', 'Authentic Player Name Search', 'Club', 'Primary', 'Secondary',
+    'Tertiary', 'Nationality', 'Birth Date', 'Age', 'Face Pic', 'Wage EUR',
+    'Wage USD', 'Wage GBP', 'Overall',
+]
+REQUIRED_COLUMNS = ['Player ID', 'Authentic Player Name Search', 'Club', 'Birth Date', 'Age', 'Overall']
+
+def parse_birth_date(value):
+    for date_format in ('%m/%d/%y', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid birth date format: {value}")
+
+def row_hash(row):
+    """Content hash of a CSV row, independent of column order"""
+    content = '\x1f'.join(f"{key}={row[key]}" for key in sorted(row, key=str))
+    return hashlib.sha256(f"{IMPORT_SOURCE}\x1e{content}".encode('utf-8')).hexdigest()
+
+def parse_wage(value):
+    """Wages must be positive, default to 100 when missing or zero"""
+    try:
+        wage = float(value)
+        return abs(wage) if wage != 0 else 100
+    except (ValueError, TypeError):
+        return 100
+
+POSITION_CODES = {code for code, _ in Player.POSITION_CHOICES}
+
+def validate_player(record):
+    """
+    Check a parsed player against the Player field limits and check
+    constraints in memory, returning the names of the rules it breaks.
+    """
+    failed = []
+    if record['potential'] < record['overall']:
+        failed.append('potential_gte_overall')
+    if record['contract_end'] <= record['contract_start']:
+        failed.append('contract_end_after_start')
+    if min(record['wage_eur'], record['wage_usd'], record['wage_gbp']) <= 0:
+        failed.append('positive_wages')
+    if not (1 <= record['overall'] <= 99 and 1 <= record['potential'] <= 99):
+        failed.append('rating_range')
+    if len(record['positions']) > 3 or not POSITION_CODES.issuperset(record['positions']):
+        failed.append('positions')
+    if not record['name'] or len(record['name']) > 100:
+        failed.append('name_length')
+    if len(record['nationality']) > 100:
+        failed.append('nationality_length')
+    return failed
+
+class PlayerRowParser:
+    """Turns a CSV row into a dict of Player field values"""
+
+    def __init__(self, club_ids, ambiguous_clubs, contract_start, contract_end):
+        self.club_ids = club_ids
+        self.ambiguous_clubs = ambiguous_clubs
+        self.contract_start = contract_start
+        self.contract_end = contract_end
+
+    def __call__(self, row):
+        # Short rows have None for the missing fields, check them before any rule reads one
+        missing = [column for column in CSV_COLUMNS if row.get(column) is None]
+        if missing:
+            raise RowValidationError(['missing_columns'], f"Missing columns: {', '.join(missing)}")
+        blank = [column for column in REQUIRED_COLUMNS if not row[column].strip()]
+        if blank:
+            raise RowValidationError(['required_fields'], f"Empty required fields: {', '.join(blank)}")
+
+        club_name = row['Club']
+        if club_name not in self.club_ids or club_name in self.ambiguous_clubs:
+            raise RowValidationError(['club_exists'], f"Club '{club_name}' does not exist or is ambiguous")
+
+        name = row['Authentic Player Name Search']
+        player_id = int(row['Player ID'])
+        birth_date = parse_birth_date(row['Birth Date'])
+
+        record = {
+            'player_id': player_id,
+            'name': name,
+            'slug': slugify(f"{name}-{player_id}"),
+            'positions': [row[key] for key in ('Primary', 'Secondary', 'Tertiary') if row[key]],
+            'nationality': row['Nationality'],
+            'birth_date': birth_date,
+            'birth_year': birth_date.year,
+            'age': int(row['Age']),
+            'face_pic_url': row['Face Pic'],
+            'club_id': self.club_ids[club_name],
+            'wage_eur': parse_wage(row['Wage EUR']),
+            'wage_usd': parse_wage(row['Wage USD']),
+            'wage_gbp': parse_wage(row['Wage GBP']),
+            'contract_start': self.contract_start,
+            'contract_end': self.contract_end,
+            'contract_loan': False,
+            'overall': int(row['Overall']),
+            # Setting potential equal to overall as default
+            'potential': int(row['Overall']),
+            'import_source': IMPORT_SOURCE,
+            'import_hash': row_hash(row),
+        }
+        failed = validate_player(record)
+        if failed:
+            raise RowValidationError(failed)
+        return record
+
+class PlayerWriter:
+    """
+    Writer stage: one lookup, one bulk insert and one UPDATE ... FROM
+    VALUES statement per batch.
+
+    In delta mode, players whose stored import_hash matches the row are left
+    untouched, so re-importing an unchanged file writes nothing. Cached
+    squads of every club a written player joins or leaves, and the player
+    search index, are dropped once the batch commits.
+    """
+
+    def __init__(self, delta=True):
+        self.delta = delta
+
+    def __call__(self, records, stats):
+        # Later rows for the same player win, as with update_or_create
+        records = {record['player_id']: record for record in records}
+        existing = {
+            player_id: (pk, import_hash, club_id)
+            for player_id, pk, import_hash, club_id in Player.objects.filter(
+                player_id__in=list(records)
+            ).values_list('player_id', 'id', 'import_hash', 'club_id')
+        }
+        # Bulk writes skip auto_now, so set it explicitly
+        now = timezone.now()
+
+        to_create = []
+        to_update = []
+        club_ids = set()
+        for player_id, record in records.items():
+            pk, import_hash, old_club_id = existing.get(player_id, (None, None, None))
+            if self.delta and pk and import_hash == record['import_hash']:
+                stats.unchanged += 1
+                continue
+            player = Player(pk=pk, last_import_date=now, **record)
+            (to_update if pk else to_create).append(player)
+            club_ids.update(club_id for club_id in (record['club_id'], old_club_id) if club_id)
+
+        Player.objects.bulk_create(to_create)
+        bulk_update_values(to_update, UPDATE_FIELDS)
+        # bulk writes send no signals, so drop the affected caches by hand
+        if club_ids:
+            transaction.on_commit(lambda: squad_cache.invalidate(club_ids))
+            transaction.on_commit(player_index.invalidate)
+        stats.created += len(to_create)
+        stats.updated += len(to_update)
 
 class Command(BaseCommand):
     help = 'Import players from FC25Players.csv'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows parsed and committed per batch')
+        parser.add_argument('--full', action='store_true', help='Rewrite every player, even rows unchanged since the last import')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything')
+        parser.add_argument('--report', type=str, default=None, help='Write a JSON report with every invalid row to this path')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to parse rows, writes stay in one process')
+        parser.add_argument('--benchmark', action='store_true', help='Time the parse stage with 1 up to --workers processes without writing')
 
     def handle(self, *args, **options):
-        csv_file_path = options['csv_file']
-        import_source = "FC25_CSV_IMPORT"
-        success_count = 0
-        error_count = 0
-        
-        with open(csv_file_path, encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            
-            for row in reader:
-                try:
-                    # Get or create the club
-                    club_name = row['Club']
-                    try:
-                        club = Club.objects.get(name=club_name)
-                    except Club.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"Club '{club_name}' does not exist. Skipping player {row['Authentic Player Name Search']}"))
-                        error_count += 1
-                        continue
-                    
-                    # Process positions
-                    positions = []
-                    if row['Primary'] and row['Primary'] != '':
-                        positions.append(row['Primary'])
-                    if row['Secondary'] and row['Secondary'] != '':
-                        positions.append(row['Secondary'])
-                    if row['Tertiary'] and row['Tertiary'] != '':
-                        positions.append(row['Tertiary'])
-                    
-                    # Parse birth date
-                    try:
-                        birth_date = datetime.strptime(row['Birth Date'], '%m/%d/%y').date()
-                    except ValueError:
-                        try:
-                            # Try alternate format
-                            birth_date = datetime.strptime(row['Birth Date'], '%m/%d/%Y').date()
-                        except ValueError:
-                            self.stdout.write(self.style.WARNING(f"Invalid birth date format for {row['Authentic Player Name Search']}: {row['Birth Date']}"))
-                            error_count += 1
-                            continue
-                    
-                    # Calculate birth year
-                    birth_year = birth_date.year
-                    
-                    # For contract dates, use approximate values (1 year contracts)
-                    contract_start = datetime.now().date()
-                    contract_end = contract_start + timedelta(days=365)
-                    
-                    # Process wages - ensure they're positive or set to default
-                    try:
-                        wage_eur = float(row['Wage EUR'])
-                        wage_eur = abs(wage_eur) if wage_eur != 0 else 100
-                    except (ValueError, TypeError):
-                        wage_eur = 100
-                        
-                    try:
-                        wage_usd = float(row['Wage USD'])
-                        wage_usd = abs(wage_usd) if wage_usd != 0 else 100
-                    except (ValueError, TypeError):
-                        wage_usd = 100
-                        
-                    try:
-                        wage_gbp = float(row['Wage GBP'])
-                        wage_gbp = abs(wage_gbp) if wage_gbp != 0 else 100
-                    except (ValueError, TypeError):
-                        wage_gbp = 100
-                    
-                    # Create or update the player
-                    player, created = Player.objects.update_or_create(
-                        player_id=int(row['Player ID']),
-                        defaults={
-                            'name': row['Authentic Player Name Search'],
-                            'slug': slugify(f"{row['Authentic Player Name Search']}-{row['Player ID']}"),
-                            'positions': positions,
-                            'nationality': row['Nationality'],
-                            'birth_date': birth_date,
-                            'birth_year': birth_year,
-                            'age': int(row['Age']),
-                            'face_pic_url': row['Face Pic'],
-                            'club': club,
-                            'wage_eur': wage_eur,
-                            'wage_usd': wage_usd,
-                            'wage_gbp': wage_gbp,
-                            'contract_start': contract_start,
-                            'contract_end': contract_end,
-                            'contract_loan': False,
-                            'overall': int(row['Overall']),
-                            # Setting potential equal to overall as default
-                            'potential': int(row['Overall']),
-                            'import_source': import_source
-                        }
-                    )
-                    
-                    action = "Created" if created else "Updated"
-                    self.stdout.write(self.style.SUCCESS(f"{action} player: {player.name} ({player.player_id})"))
-                    success_count += 1
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Error processing player {row.get('Authentic Player Name Search', 'Unknown')}: {e}")
-                    )
-                    error_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Import complete. Successfully imported {success_count} players. Errors: {error_count}"
+        # Club names are only unique per country, so ambiguous names are skipped
+        club_ids = {}
+        ambiguous_clubs = set()
+        for club_id, name in Club.objects.values_list('id', 'name'):
+            if name in club_ids:
+                ambiguous_clubs.add(name)
+            club_ids[name] = club_id
+
+        # For contract dates, use approximate values (1 year contracts)
+        contract_start = datetime.now().date()
+        contract_end = contract_start + timedelta(days=365)
+        parse_row = PlayerRowParser(club_ids, ambiguous_clubs, contract_start, contract_end)
+
+        if options['benchmark']:
+            self.benchmark(options, parse_row)
+            return
+
+        stats = run_pipeline(
+            read_csv_batches(options['csv_file'], options['batch_size']),
+            parse_rows(parse_row),
+            PlayerWriter(delta=not options['full']),
+            stats=ImportStats(max_errors=None if options['report'] else 100),
+            progress=lambda stats: self.stdout.write(stats.progress()),
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['verbosity'] > 1:
+            for error in stats.error_samples:
+                self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['message']}"))
+
+        if options['report']:
+            stats.write_report(options['report'])
+            self.stdout.write(f"Report written to {options['report']}")
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Dry run complete in {stats.elapsed:.1f}s. {stats.rows} rows, "
+                    f"{stats.valid} valid, {stats.skipped} skipped, {stats.errors} errors"
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Import complete. {stats.summary()}"))
+
+    def benchmark(self, options, parse_row):
+        """Report parse throughput for doubling worker counts up to --workers"""
+        workers = 1
+        baseline = None
+        while True:
+            stats = run_pipeline(
+                read_csv_batches(options['csv_file'], options['batch_size']),
+                parse_rows(parse_row),
+                PlayerWriter(),
+                workers=workers,
+                dry_run=True,
+            )
+            rate = stats.rows / stats.elapsed if stats.elapsed else 0
+            baseline = baseline or rate
+            self.stdout.write(
+                f"{workers} worker(s): {stats.rows} rows in {stats.elapsed:.2f}s, "
+                f"{rate:.0f} rows/s, {rate / baseline if baseline else 0:.2f}x"
             )
-        )
\ No newline at end of file
+            if workers >= options['workers']:
+                break
+            workers = min(workers * 2, options['workers'])
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from storytracker.models import Club
+from storytracker.utils.background_cache import missing_variants, store_background
+from storytracker.utils.story_generator import generate_club_background, get_prompt_hash
+
+class Command(BaseCommand):
+    help = 'Pre-generate cached club backgrounds, most prestigious clubs first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Only warm the top N clubs')
+        parser.add_argument('--concurrency', type=int, default=2, help='Backgrounds generated in parallel, at most LLM_MAX_CONCURRENCY')
+        parser.add_argument('--checkpoint', type=str, default='prewarm_checkpoint.json', help='File recording finished club ids so a run can be resumed')
+        parser.add_argument('--restart', action='store_true', help='Ignore the existing checkpoint file')
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        prompt_hash = get_prompt_hash()
+        model_name = settings.LLM_MODEL
+
+        done_ids = set()
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            # A checkpoint from another prompt or model does not apply
+            if checkpoint.get('prompt_hash') == prompt_hash and checkpoint.get('model_name') == model_name:
+                done_ids = set(checkpoint.get('done', []))
+                self.stdout.write(f"Resuming, {len(done_ids)} clubs already warmed")
+
+        clubs = Club.objects.order_by('-intl_prestige', '-dom_prestige', '-overall').values_list('id', 'name')
+        if options['limit']:
+            clubs = clubs[:options['limit']]
+        pending = [(club_id, name) for club_id, name in clubs if club_id not in done_ids]
+
+        lock = threading.Lock()
+        stats = {'generated': 0, 'skipped': 0, 'errors': 0, 'llm_seconds': 0.0}
+
+        def save_checkpoint():
+            with open(checkpoint_path, 'w') as f:
+                json.dump({'prompt_hash': prompt_hash, 'model_name': model_name, 'done': sorted(done_ids)}, f)
+
+        def warm(club_id, name):
+            try:
+                needed = missing_variants(club_id, prompt_hash, model_name)
+                for _ in range(needed):
+                    started = time.monotonic()
+                    background = generate_club_background(name)
+                    elapsed = time.monotonic() - started
+                    store_background(club_id, prompt_hash, model_name, background)
+                    with lock:
+                        stats['generated'] += 1
+                        stats['llm_seconds'] += elapsed
+                if not needed:
+                    with lock:
+                        stats['skipped'] += 1
+            finally:
+                close_old_connections()
+
+        # Threads past the LLM slot limit would only wait for a slot and time out
+        concurrency = max(1, options['concurrency'])
+        if concurrency > settings.LLM_MAX_CONCURRENCY:
+            concurrency = settings.LLM_MAX_CONCURRENCY
+            self.stdout.write(
+                self.style.WARNING(f"Concurrency capped at LLM_MAX_CONCURRENCY ({concurrency})")
+            )
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(warm, club_id, name): (club_id, name) for club_id, name in pending}
+            for future in as_completed(futures):
+                club_id, name = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    stats['errors'] += 1
+                    self.stdout.write(self.style.ERROR(f"Error warming '{name}': {str(e)}"))
+                    continue
+                with lock:
+                    done_ids.add(club_id)
+                    save_checkpoint()
+
+        elapsed = time.monotonic() - started
+        generated = stats['generated']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nPrewarm summary: {len(pending)} clubs processed, {generated} backgrounds generated, "
+                f"{stats['skipped']} already cached, {stats['errors']} errors"
+            )
+        )
+        if generated:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Throughput: {generated / elapsed * 60:.1f} backgrounds/min over {elapsed:.1f}s, "
+                    f"average LLM latency {stats['llm_seconds'] / generated:.1f}s"
+                )
+            )
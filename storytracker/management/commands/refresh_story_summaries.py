@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from storytracker.models import Story, StorySummary
+
+class Command(BaseCommand):
+    help = 'Rebuild the StorySummary of every story, e.g. after the table is created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only build summaries for stories without one')
+
+    def handle(self, *args, **options):
+        stories = Story.objects.order_by('id')
+        if options['missing']:
+            stories = stories.filter(summary__isnull=True)
+
+        refreshed = 0
+        for story_id in stories.values_list('id', flat=True).iterator():
+            StorySummary.refresh(story_id)
+            refreshed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} story summaries"))
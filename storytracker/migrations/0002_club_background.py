@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storytracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClubBackground',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('html', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backgrounds', to='storytracker.club')),
+            ],
+            options={
+                'verbose_name': 'Club Background',
+                'verbose_name_plural': 'Club Backgrounds',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='clubbackground',
+            index=models.Index(fields=['club', 'prompt_hash', 'model_name', 'created_at'], name='storytracke_club_id_bd41b0_idx'),
+        ),
+    ]
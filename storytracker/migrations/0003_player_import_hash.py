@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storytracker', '0002_club_background'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='import_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
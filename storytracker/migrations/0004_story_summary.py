@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storytracker', '0003_player_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorySummary',
+            fields=[
+                ('story', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='storytracker.story')),
+                ('is_public', models.BooleanField(default=True)),
+                ('total_seasons', models.PositiveIntegerField(default=0)),
+                ('trophies', models.PositiveIntegerField(default=0)),
+                ('transfers', models.PositiveIntegerField(default=0)),
+                ('total_goals', models.PositiveIntegerField(default=0)),
+                ('top_scorer_goals', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('current_season', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='storytracker.season')),
+                ('top_scorer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='storytracker.player')),
+            ],
+            options={
+                'verbose_name': 'Story Summary',
+                'verbose_name_plural': 'Story Summaries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='storysummary',
+            index=models.Index(fields=['is_public', '-trophies', '-total_goals', '-story'], name='storytracke_is_publ_88b8e1_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def backfill_story_summaries(apps, schema_editor):
+    """
+    Summarize every existing story, so the public leaderboard is complete
+    as soon as the table exists. New stories get theirs from the signals.
+
+    Uses the same refresh as the refresh_story_summaries command. A fresh
+    database has no stories, so this only runs against the schema of the
+    deployment being upgraded.
+    """
+    from storytracker.models import StorySummary
+
+    Story = apps.get_model('storytracker', 'Story')
+    for story_id in Story.objects.order_by('id').values_list('id', flat=True).iterator():
+        StorySummary.refresh(story_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storytracker', '0004_story_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_story_summaries, migrations.RunPython.noop),
+    ]
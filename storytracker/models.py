@@ -1,4 +1,8 @@
-from django.db import models
+import threading
+import weakref
+from django.db import connection, models, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -295,6 +299,9 @@ class Player (models.Model):
             DateTimeField(auto_now=True).
             import_source (str): Data source identifier. CharField(100),
             can be null.
+            import_hash (str): Hash of the CSV row this player was last
+            imported from, used to skip unchanged rows. CharField(64), can
+            be null.
 
     Methods:
         save(*args, **kwargs): Overrides default save to:
@@ -392,6 +399,9 @@ class Player (models.Model):
     import_source = models.CharField (
         max_length = 100, blank = True, null = True
         )  # e.g., "FIFA23_CSV_IMPORT"
+    import_hash = models.CharField (
+        max_length = 64, blank = True, null = True
+        )  # Content hash of the last imported CSV row
 
     # Meta configuration
     class Meta:
@@ -605,12 +615,23 @@ class Story (models.Model):
         - Trophies won
         - Top scorers
         - etc.
+
+        Read from the story's StorySummary in one query, building the
+        summary first if the story doesn't have one yet.
         """
+        summary = StorySummary.objects.select_related (
+            'current_season', 'top_scorer'
+            ).filter (story_id = self.pk).first ()
+        if summary is None:
+            summary = StorySummary.refresh (self.pk)
         return {
-            'total_seasons': self.seasons.count (),
-            'trophies': self.competition_winners.count (),
-            'transfers': self.transfers.count (),
-            'current_season': self.get_current_season (),
+            'total_seasons': summary.total_seasons,
+            'trophies': summary.trophies,
+            'transfers': summary.transfers,
+            'current_season': summary.current_season,
+            'total_goals': summary.total_goals,
+            'top_scorer': summary.top_scorer,
+            'top_scorer_goals': summary.top_scorer_goals,
         }
 
 class Season (models.Model):
@@ -639,6 +660,8 @@ class Season (models.Model):
         get_statistics(): Returns aggregated season statistics.
         get_formations(): Returns frequently used formations.
         get_top_players(): Returns top performing players.
+        recompute_player_stats(): Recomputes every player's season totals
+        from their competition statistics in one UPDATE.
     """
     story = models.ForeignKey (
         Story, on_delete = models.CASCADE, related_name = 'seasons'
@@ -715,6 +738,12 @@ class Season (models.Model):
         """Returns the top performing players by average rating"""
         return self.player_stats.order_by ('-average_rating')[:limit]
 
+    def recompute_player_stats (self):
+        """Recomputes all player totals for the season from competition stats"""
+        updated = self.player_stats.recompute_from_competitions ()
+        StorySummary.refresh_on_commit (self.story_id)
+        return updated
+
 class Transfer (models.Model):
     """
     Represents a player transfer between clubs.
@@ -765,6 +794,86 @@ class Transfer (models.Model):
     class Meta:
         unique_together = ('season', 'player', 'from_club', 'to_club')
 
+# Totals on PlayerStats that are sums of the player's CompetitionPlayerStats
+COMPETITION_TOTAL_FIELDS = (
+    'appearances', 'goals', 'assists', 'clean_sheets', 'red_cards',
+    'yellow_cards',
+)
+
+def weighted_rating (prefix = ''):
+    """
+    Average rating across rows weighted by appearances, as an aggregate
+    expression. One cup game then counts for less than a league season.
+
+    Args:
+        prefix (str): Lookup prefix to the stats rows, e.g.
+        'competition_stats__' when aggregating from Player.
+    """
+    appearances = F (f"{prefix}appearances")
+    # Casting to the field's precision rounds to 2 places
+    return Cast (
+        Coalesce (
+            Sum (F (f"{prefix}average_rating") * appearances)
+            / NullIf (Sum (appearances), 0),
+            0,
+        ),
+        output_field = DecimalField (max_digits = 4, decimal_places = 2),
+    )
+
+class PlayerStatsQuerySet (models.QuerySet):
+    def recompute_from_competitions (self):
+        """
+        Recompute the totals of every row in the queryset from its
+        competition stats, as one grouped UPDATE in the database.
+
+        Rows without any competition stats keep the totals entered by hand.
+        Returns the number of rows updated.
+        """
+        quote = connection.ops.quote_name
+        player_stats = quote (PlayerStats._meta.db_table)
+        competition_stats = quote (CompetitionPlayerStats._meta.db_table)
+        ids_sql, ids_params = self.values ('id').query.sql_with_params ()
+
+        columns = [quote (field) for field in COMPETITION_TOTAL_FIELDS]
+        sums = ', '.join (f"SUM ({column}) AS {column}" for column in columns)
+        assignments = ', '.join (f"{column} = totals.{column}" for column in columns)
+        sql = f"""
+            UPDATE {player_stats}
+            SET {assignments}, average_rating = totals.average_rating
+            FROM (
+                SELECT season_id, player_id, {sums},
+                    COALESCE (ROUND (
+                        SUM (average_rating * appearances)
+                        / NULLIF (SUM (appearances), 0), 2
+                    ), 0) AS average_rating
+                FROM {competition_stats}
+                WHERE (season_id, player_id) IN (
+                    SELECT season_id, player_id FROM {player_stats}
+                    WHERE id IN ({ids_sql})
+                )
+                GROUP BY season_id, player_id
+            ) AS totals
+            WHERE {player_stats}.season_id = totals.season_id
+                AND {player_stats}.player_id = totals.player_id
+                AND {player_stats}.id IN ({ids_sql})
+        """
+        with connection.cursor () as cursor:
+            cursor.execute (sql, ids_params + ids_params)
+            return cursor.rowcount
+
+    def leaderboard (self):
+        """
+        One row per player across every season in the queryset, with summed
+        totals and the appearance-weighted rating, best rated first. Runs as
+        a single grouped query, so it can be sliced and paged in the database.
+        """
+        return self.values ('player_id', 'player__name').annotate (
+            total_appearances = Sum ('appearances'),
+            total_goals = Sum ('goals'),
+            total_assists = Sum ('assists'),
+            weighted_rating = weighted_rating (),
+        ).order_by ('-weighted_rating', '-total_appearances', 'player_id')
+
 class PlayerStats (models.Model):
     """
     Represents the statistics of a player for a specific season.
@@ -802,13 +911,16 @@ class PlayerStats (models.Model):
 
     Methods:
         aggregate_competition_stats(): Aggregates and returns the player's
-        statistics from all competitions in the season.
+        statistics from all competitions in the season, with the average
+        rating weighted by appearances.
         goals_per_game(): Calculates and returns the player's goals per game
         ratio.
         assists_per_game(): Calculates and returns the player's assists per
         game ratio.
         update_from_competitions(): Updates the player's aggregate statistics
-        from competition statistics.
+        from competition statistics with a single UPDATE.
+        competition_stats: Property returning the player's
+        CompetitionPlayerStats for the same season.
 
     Meta:
         unique_together (tuple): Ensures that the combination of season and
@@ -868,6 +980,8 @@ class PlayerStats (models.Model):
         help_text = "Average match rating out of 10"
     )
 
+    objects = PlayerStatsQuerySet.as_manager ()
+
     class Meta:
         unique_together = ['season', 'player']
         indexes = [
@@ -876,34 +990,22 @@ class PlayerStats (models.Model):
             models.Index (fields = ['-assists']),
         ]
 
-    def aggregate_competition_stats (self):
-        """Aggregate stats from CompetitionPlayerStats"""
-        competition_stats = self.competition_player_stats.all ()
-        total_appearances = sum (stat.appearances for stat in competition_stats)
-        total_goals = sum (stat.goals for stat in competition_stats)
-        total_assists = sum (stat.assists for stat in competition_stats)
-        total_clean_sheets = sum (
-            stat.clean_sheets for stat in competition_stats
-            )
-        total_red_cards = sum (stat.red_cards for stat in competition_stats)
-        total_yellow_cards = sum (
-            stat.yellow_cards for stat in competition_stats
+    @property
+    def competition_stats (self):
+        """This player's CompetitionPlayerStats for the same season"""
+        return CompetitionPlayerStats.objects.filter (
+            season_id = self.season_id, player_id = self.player_id
             )
-        average_rating = sum (
-            stat.average_rating for stat in competition_stats
-            ) / len (
-            competition_stats
-        ) if competition_stats else 0
 
-        return {
-            'total_appearances': total_appearances,
-            'total_goals': total_goals,
-            'total_assists': total_assists,
-            'total_clean_sheets': total_clean_sheets,
-            'total_red_cards': total_red_cards,
-            'total_yellow_cards': total_yellow_cards,
-            'average_rating': average_rating,
-        }
+    def aggregate_competition_stats (self):
+        """Aggregate stats from CompetitionPlayerStats in a single query"""
+        return self.competition_stats.aggregate (
+            **{
+                f"total_{field}": Coalesce (Sum (field), 0)
+                for field in COMPETITION_TOTAL_FIELDS
+            },
+            average_rating = weighted_rating (),
+        )
 
     @property
     def goals_per_game (self):
@@ -921,11 +1023,10 @@ class PlayerStats (models.Model):
 
     def update_from_competitions (self):
         """Update aggregate stats from competition stats"""
-        stats = self.aggregate_competition_stats ()
-        for key, value in stats.items ():
-            if hasattr (self, key):
-                setattr (self, key, value)
-        self.save ()
+        PlayerStats.objects.filter (pk = self.pk).recompute_from_competitions ()
+        self.refresh_from_db (
+            fields = [*COMPETITION_TOTAL_FIELDS, 'average_rating']
+            )
 
 class CompetitionPlayerStats (models.Model):
     """
@@ -1125,3 +1226,239 @@ class AwardWinner (models.Model):
                 name='unique_season_award'
             )
         ]
+
+class ClubBackground (models.Model):
+    """
+    A generated club background kept so repeat generations skip the LLM.
+
+    Attributes:
+        club (Club): The club the background describes. ForeignKey to the
+        Club model with CASCADE delete behavior.
+        prompt_hash (str): Hash of the prompt template the background was
+        generated from, so template changes invalidate old entries.
+        CharField(64).
+        model_name (str): The LLM model that wrote the background.
+        CharField(100).
+        html (str): The cleaned HTML background. TextField.
+        created_at (datetime): When the background was generated. Used for
+        TTL expiry.
+
+    Meta:
+        indexes (list): Lookup of fresh variants for a club, prompt and model.
+    """
+    club = models.ForeignKey (
+        Club, on_delete = models.CASCADE, related_name = 'backgrounds'
+        )
+    prompt_hash = models.CharField (max_length = 64)
+    model_name = models.CharField (max_length = 100)
+    html = models.TextField ()
+    created_at = models.DateTimeField (auto_now_add = True)
+
+    class Meta:
+        verbose_name = "Club Background"
+        verbose_name_plural = "Club Backgrounds"
+        indexes = [
+            models.Index (
+                fields = ['club', 'prompt_hash', 'model_name', 'created_at']
+                ),
+        ]
+
+    def __str__ (self):
+        return f"{self.club.name} ({self.model_name})"
+
+# Story ids to refresh when the current transaction commits, and stories
+# being deleted. Django gives each thread its own connection, so a thread
+# local is per connection.
+_summary_state = threading.local ()
+
+def _summary_transaction_state ():
+    """
+    The summary bookkeeping of the current transaction. Outside a
+    transaction nothing can be pending, so ids a rolled back transaction
+    left behind are dropped here. Inside one they are refreshed with the
+    next commit, which only costs a redundant refresh.
+    """
+    if not hasattr (_summary_state, 'pending') or not connection.in_atomic_block:
+        _summary_state.pending = set ()
+        _summary_state.deleting = {}
+    return _summary_state
+
+class StorySummary (models.Model):
+    """
+    Precomputed statistics of one story, refreshed whenever its seasons,
+    trophies, transfers or player stats change.
+
+    Attributes:
+        story (Story): The summarized story, also the primary key.
+        OneToOneField to the Story model with CASCADE delete behavior.
+        is_public (bool): Copy of Story.is_public, so the public leaderboard
+        is read from this table alone.
+        total_seasons (int): Number of seasons in the story.
+        trophies (int): Number of competitions won.
+        transfers (int): Number of transfers in or out.
+        total_goals (int): Goals scored by all players in all seasons.
+        top_scorer (Player): The player with the most goals across the
+        story, null when nobody has scored. ForeignKey to the Player model
+        with SET_NULL delete behavior.
+        top_scorer_goals (int): Goals scored by the top scorer.
+        current_season (Season): The story's current season, if any.
+        ForeignKey to the Season model with SET_NULL delete behavior.
+        updated_at (datetime): When the summary was last refreshed.
+
+    Methods:
+        refresh(story_id): Recomputes and saves the summary of a story.
+        refresh_on_commit(story_id): Schedules refresh() for when the
+        current transaction commits.
+        mark_story_deleting(story_id), story_deleted(story_id): Bracket the
+        deletion of a story, see is_story_deleting().
+
+    Meta:
+        indexes (list): Public leaderboard order, so each page is one index
+        range scan.
+    """
+    story = models.OneToOneField (
+        Story,
+        on_delete = models.CASCADE,
+        primary_key = True,
+        related_name = 'summary'
+    )
+    is_public = models.BooleanField (default = True)
+    total_seasons = models.PositiveIntegerField (default = 0)
+    trophies = models.PositiveIntegerField (default = 0)
+    transfers = models.PositiveIntegerField (default = 0)
+    total_goals = models.PositiveIntegerField (default = 0)
+    top_scorer = models.ForeignKey (
+        Player,
+        on_delete = models.SET_NULL,
+        null = True,
+        blank = True,
+        related_name = '+'
+    )
+    top_scorer_goals = models.PositiveIntegerField (default = 0)
+    current_season = models.ForeignKey (
+        Season,
+        on_delete = models.SET_NULL,
+        null = True,
+        blank = True,
+        related_name = '+'
+    )
+    updated_at = models.DateTimeField (auto_now = True)
+
+    class Meta:
+        verbose_name = "Story Summary"
+        verbose_name_plural = "Story Summaries"
+        indexes = [
+            models.Index (
+                fields = ['is_public', '-trophies', '-total_goals', '-story']
+                ),
+        ]
+
+    def __str__ (self):
+        return f"Summary of {self.story_id}"
+
+    @classmethod
+    def refresh (cls, story_id):
+        """
+        Recomputes the summary of a story with one query over its rows and
+        saves it. Returns the summary, or None if the story no longer exists.
+        """
+        def per_story (queryset, aggregate):
+            return Coalesce (Subquery (
+                queryset.filter (story = OuterRef ('pk')).order_by ()
+                .values ('story').annotate (value = aggregate).values ('value')
+            ), 0)
+
+        scorers = PlayerStats.objects.filter (
+            story = OuterRef ('pk')
+            ).values ('player').annotate (
+            goals = Sum ('goals')
+            ).order_by ('-goals', 'player_id')
+
+        row = Story.objects.filter (pk = story_id).annotate (
+            summary_seasons = per_story (Season.objects, Count ('id')),
+            summary_trophies = per_story (CompetitionWinner.objects, Count ('id')),
+            summary_transfers = per_story (Transfer.objects, Count ('id')),
+            summary_goals = per_story (PlayerStats.objects, Sum ('goals')),
+            summary_top_scorer = Subquery (scorers.values ('player')[:1]),
+            summary_top_scorer_goals = Coalesce (
+                Subquery (scorers.values ('goals')[:1]), 0
+                ),
+            summary_current_season = Subquery (
+                Season.objects.filter (story = OuterRef ('pk'), is_current = True)
+                .order_by ('-season_number').values ('id')[:1]
+            ),
+        ).values (
+            'is_public', 'summary_seasons', 'summary_trophies',
+            'summary_transfers', 'summary_goals', 'summary_top_scorer',
+            'summary_top_scorer_goals', 'summary_current_season',
+        ).first ()
+
+        if row is None:
+            cls.objects.filter (story_id = story_id).delete ()
+            return None
+
+        summary, _ = cls.objects.update_or_create (
+            story_id = story_id,
+            defaults = {
+                'is_public': row['is_public'],
+                'total_seasons': row['summary_seasons'],
+                'trophies': row['summary_trophies'],
+                'transfers': row['summary_transfers'],
+                'total_goals': row['summary_goals'],
+                # Nobody is top scorer until someone scores
+                'top_scorer_id': row['summary_top_scorer'] if row['summary_top_scorer_goals'] else None,
+                'top_scorer_goals': row['summary_top_scorer_goals'],
+                'current_season_id': row['summary_current_season'],
+            }
+        )
+        return summary
+
+    @classmethod
+    def refresh_on_commit (cls, story_id):
+        """
+        Refreshes the summary once the current transaction commits, so a
+        rolled back write never reaches it. All writes to a story in one
+        transaction share a single refresh, and rows deleted along with
+        their story queue none.
+        """
+        if cls.is_story_deleting (story_id):
+            return
+        _summary_transaction_state ().pending.add (story_id)
+        # Queuing is cheap, the first hook to run refreshes every pending story
+        transaction.on_commit (cls._refresh_pending)
+
+    @classmethod
+    def _refresh_pending (cls):
+        pending = getattr (_summary_state, 'pending', set ())
+        _summary_state.pending = set ()
+        for story_id in sorted (pending):
+            cls.refresh (story_id)
+
+    @staticmethod
+    def mark_story_deleting (story_id):
+        """
+        Called before a story is deleted, until story_deleted(). The mark
+        only holds a weak reference to an on_commit hook, which Django
+        drops after the commit or on a rollback, so a failed delete never
+        leaves it behind.
+        """
+        def hook ():
+            pass
+        transaction.on_commit (hook)
+        _summary_transaction_state ().deleting[story_id] = weakref.ref (hook)
+
+    @staticmethod
+    def story_deleted (story_id):
+        """Called once the story row is gone, its summary went with it"""
+        state = _summary_transaction_state ()
+        state.deleting.pop (story_id, None)
+        state.pending.discard (story_id)
+
+    @staticmethod
+    def is_story_deleting (story_id):
+        """
+        True while the story is being deleted, so rows cascading with it
+        can skip work on a story that is about to disappear.
+        """
+        hook = _summary_transaction_state ().deleting.get (story_id)
+        return hook is not None and hook () is not None
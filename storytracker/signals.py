@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .models import (
+    COMPETITION_TOTAL_FIELDS, Club, CompetitionPlayerStats, CompetitionWinner, Player,
+    PlayerStats, Season, Story, StorySummary, Transfer,
+)
+from .utils import club_index, player_index, squad_cache
+
+
+@receiver([post_save, post_delete], sender=Club)
+def refresh_club_index(sender, **kwargs):
+    """Keep the random club index in step with single-row club changes"""
+    club_index.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Player)
+def refresh_squad_cache(sender, instance, **kwargs):
+    """Drop the cached squad and search index when a player changes"""
+    player_index.invalidate()
+    if instance.club_id is not None:
+        squad_cache.invalidate([instance.club_id])
+
+
+@receiver([post_save, post_delete], sender=CompetitionPlayerStats)
+def refresh_player_stat_totals(sender, instance, signal, **kwargs):
+    """Keep the player's season totals in step with their competition stats"""
+    if StorySummary.is_story_deleting(instance.story_id):
+        # The totals go with the story
+        return
+    player_stats = PlayerStats.objects.filter(season_id=instance.season_id, player_id=instance.player_id)
+    if not player_stats.recompute_from_competitions():
+        # The last competition row is gone, so the totals drop to zero
+        if signal is post_delete:
+            player_stats.update(average_rating=0, **{field: 0 for field in COMPETITION_TOTAL_FIELDS})
+    StorySummary.refresh_on_commit(instance.story_id)
+
+
+@receiver([post_save, post_delete], sender=Season)
+@receiver([post_save, post_delete], sender=Transfer)
+@receiver([post_save, post_delete], sender=CompetitionWinner)
+@receiver([post_save, post_delete], sender=PlayerStats)
+def refresh_story_summary(sender, instance, **kwargs):
+    """Keep the story's summary in step with the rows it counts"""
+    StorySummary.refresh_on_commit(instance.story_id)
+
+
+@receiver(post_save, sender=Story)
+def create_story_summary(sender, instance, **kwargs):
+    """New stories get a summary, and is_public changes reach the leaderboard"""
+    StorySummary.refresh_on_commit(instance.pk)
+
+
+@receiver(pre_delete, sender=Story)
+def mark_story_deleting(sender, instance, **kwargs):
+    """Rows deleted along with the story skip their recompute and summary refresh"""
+    StorySummary.mark_story_deleting(instance.pk)
+
+
+@receiver(post_delete, sender=Story)
+def story_deleted(sender, instance, **kwargs):
+    """The story's rows are gone, so its id no longer skips refreshes"""
+    StorySummary.story_deleted(instance.pk)
@@ -11,12 +11,12 @@ $(document).ready(function() {
     
     let newStatId = -1;
     let newTransferId = -1;
-    let clubPlayers = []; // Store club players for autocomplete
+    let storyClubId = null; // Story club, ranked first in player search
+    let searchTimer = null;
+    let searchRequest = null;
     let selectedPlayerId = null; // Track the currently selected player
+    let seasonCache = {}; // Season data from the dashboard endpoint, keyed by season id
 
-    // Load players for the current club
-    loadClubPlayers();
-    
     // Handle season filter change
     $('#seasonFilter').change(function() {
         const seasonId = $(this).val();
@@ -35,33 +35,45 @@ $(document).ready(function() {
     
     // Handle player search input
     $('#playerSearch').on('input', function() {
-        const searchTerm = $(this).val().toLowerCase();
+        const searchTerm = $(this).val().trim();
         const resultsContainer = $('#playerSearchResults');
-        resultsContainer.empty();
+        selectedPlayerId = null;
+        clearTimeout(searchTimer);
         
         if (searchTerm.length < 2) {
-            resultsContainer.removeClass('show');
+            resultsContainer.empty().removeClass('show');
             return;
         }
         
-        // Filter players by search term
-        const filteredPlayers = clubPlayers.filter(player => 
-            player.name.toLowerCase().includes(searchTerm)
-        );
-        
-        // Show results
-        if (filteredPlayers.length > 0) {
-            filteredPlayers.forEach(player => {
-                resultsContainer.append(
-                    `<div class="player-search-item" data-player-id="${player.id}" data-player-overall="${player.overall}">
-                        ${player.name} (${player.overall})
-                    </div>`
-                );
+        // Wait for a pause in typing, then search every player by name
+        searchTimer = setTimeout(function() {
+            if (searchRequest) {
+                searchRequest.abort();
+            }
+            searchRequest = $.ajax({
+                url: "/api/players/search/",
+                type: "GET",
+                data: { q: searchTerm, club: storyClubId || '' },
+                success: function(response) {
+                    resultsContainer.empty();
+                    
+                    // Show results
+                    if (response.players.length > 0) {
+                        response.players.forEach(player => {
+                            resultsContainer.append(
+                                $('<div class="player-search-item"></div>')
+                                    .attr('data-player-id', player.id)
+                                    .attr('data-player-overall', player.overall)
+                                    .text(`${player.name} (${player.overall})`)
+                            );
+                        });
+                        resultsContainer.addClass('show');
+                    } else {
+                        resultsContainer.removeClass('show');
+                    }
+                }
             });
-            resultsContainer.addClass('show');
-        } else {
-            resultsContainer.removeClass('show');
-        }
+        }, 150);
     });
     
     // Handle player selection from search results
@@ -129,7 +141,7 @@ $(document).ready(function() {
                     }, 500);
                     
                     // Refresh the player stats table
-                    loadSeasonData($('#seasonFilter').val());
+                    loadSeasonData($('#seasonFilter').val(), true);
                     
                     // Show success message
                     showAlert('Player statistics saved successfully!', 'success');
@@ -218,6 +230,9 @@ $(document).ready(function() {
                 },
                 success: function(response) {
                     if (response.success) {
+                        // Cached seasons are stale now, refetch on the next switch
+                        seasonCache = {};
+                        
                         // Remove the row with animation
                         row.fadeOut(300, function() {
                             $(this).remove();
@@ -293,7 +308,7 @@ $(document).ready(function() {
                     seasonSelect.value = response.season_id;
                     
                     // Load the new season's data
-                    loadSeasonData(response.season_id);
+                    loadSeasonData(response.season_id, true);
                     
                     showAlert('New season added successfully!', 'success');
                 } else {
@@ -310,94 +325,88 @@ $(document).ready(function() {
         });
     });
 
+    // Function to load everything the page shows for all seasons in one request
+    function loadDashboard() {
+        // Save queued cell edits first, so the refetch cannot bring back old values
+        return flushPlayerStatEdits().then(function() {
+            return $.ajax({
+                url: `/api/stories/${STORY_SLUG}/dashboard/`,
+                type: "GET"
+            });
+        }).then(function(response) {
+            storyClubId = response.story.club_id;
+            seasonCache = {};
+            response.seasons.forEach(function(season) {
+                seasonCache[season.id] = season;
+            });
+        }, function() {
+            console.error("Failed to load story data");
+            showAlert('Failed to load story data. Please refresh the page.', 'danger');
+        });
+    }
+    
     // Function to load season data (stats, awards, transfers)
-    function loadSeasonData(seasonId) {
-        // Update all section headers with the season name
-        $.ajax({
-            url: `/api/seasons/${seasonId}/`,
-            type: "GET",
-            success: function(response) {
-                if (response.success) {
-                    $('.season-name').text(response.season.name);
-                }
+    function loadSeasonData(seasonId, refresh = false) {
+        // Switching seasons renders from the cache, edits refetch the dashboard
+        const loaded = (refresh || !seasonCache[seasonId]) ? loadDashboard() : $.when();
+        
+        loaded.then(function() {
+            const season = seasonCache[seasonId];
+            if (!season) {
+                return;
             }
+            // Update all section headers with the season name
+            $('.season-name').text(season.name);
+            renderPlayerStats(seasonId, season.player_stats);
         });
         
-        // Load player stats
-        loadPlayerStats(seasonId);
-        
         // Hide quick add row when changing seasons
         $('#quickAddRow').hide();
         resetQuickAddForm();
     }
     
-    // Function to load club players
-    function loadClubPlayers() {
-        $.ajax({
-            url: `/api/clubs/${CLUB_ID}/players/`,  // Use the JS variable
-            type: "GET",
-            success: function(response) {
-                clubPlayers = response.players;
-            },
-            error: function() {
-                console.error("Failed to load players");
-                showAlert('Failed to load club players. Please refresh the page.', 'danger');
-            }
-        });
-    }
-    
-    // Function to load player stats for a specific season
-    function loadPlayerStats(seasonId) {
-        $.ajax({
-            url: `/api/seasons/${seasonId}/player-stats/`,
-            type: "GET",
-            success: function(response) {
-                const tableBody = $('#playerStatsTable');
-                const quickAddRow = $('#quickAddRow').detach();
-                tableBody.empty().append(quickAddRow);
-                
-                if (response.player_stats.length === 0) {
-                    tableBody.append(`
-                        <tr id="emptyStateRow">
-                            <td colspan="10" class="text-center">
-                                <div class="empty-state">
-                                    <i class="fas fa-user-slash"></i>
-                                    <p>No player statistics available for this season.</p>
-                                </div>
-                            </td>
-                        </tr>
-                    `);
-                    return;
-                }
-                
-                response.player_stats.forEach(function(stat) {
-                    tableBody.append(`
-                        <tr data-stat-id="${stat.id}" data-season="${seasonId}">
-                            <td contenteditable="true" data-field="player" data-stat-id="${stat.id}" class="text-left">${stat.player_name}</td>
-                            <td contenteditable="true" data-field="overall_rating" data-stat-id="${stat.id}" class="text-center">${stat.overall_rating}</td>
-                            <td contenteditable="true" data-field="appearances" data-stat-id="${stat.id}" class="text-center">${stat.appearances}</td>
-                            <td contenteditable="true" data-field="goals" data-stat-id="${stat.id}" class="text-center">${stat.goals}</td>
-                            <td contenteditable="true" data-field="assists" data-stat-id="${stat.id}" class="text-center">${stat.assists}</td>
-                            <td contenteditable="true" data-field="clean_sheets" data-stat-id="${stat.id}" class="text-center">${stat.clean_sheets}</td>
-                            <td contenteditable="true" data-field="yellow_cards" data-stat-id="${stat.id}" class="text-center">${stat.yellow_cards}</td>
-                            <td contenteditable="true" data-field="red_cards" data-stat-id="${stat.id}" class="text-center">${stat.red_cards}</td>
-                            <td contenteditable="true" data-field="average_rating" data-stat-id="${stat.id}" class="text-center">${stat.average_rating}</td>
-                            <td class="text-center">
-                                <button class="btn btn-sm btn-danger delete-player-btn" data-stat-id="${stat.id}">
-                                    <i class="fas fa-trash"></i>
-                                </button>
-                            </td>
-                        </tr>
-                    `);
-                });
-                
-                setupContentEditableHandlers();
-            },
-            error: function() {
-                console.error("Failed to load player stats");
-                showAlert('Failed to load player statistics. Please refresh the page.', 'danger');
-            }
+    // Function to render the player stats table for a season
+    function renderPlayerStats(seasonId, playerStats) {
+        const tableBody = $('#playerStatsTable');
+        const quickAddRow = $('#quickAddRow').detach();
+        tableBody.empty().append(quickAddRow);
+        
+        if (playerStats.length === 0) {
+            tableBody.append(`
+                <tr id="emptyStateRow">
+                    <td colspan="10" class="text-center">
+                        <div class="empty-state">
+                            <i class="fas fa-user-slash"></i>
+                            <p>No player statistics available for this season.</p>
+                        </div>
+                    </td>
+                </tr>
+            `);
+            return;
+        }
+        
+        playerStats.forEach(function(stat) {
+            tableBody.append(`
+                <tr data-stat-id="${stat.id}" data-season="${seasonId}">
+                    <td contenteditable="true" data-field="player" data-stat-id="${stat.id}" class="text-left">${stat.player_name}</td>
+                    <td contenteditable="true" data-field="overall_rating" data-stat-id="${stat.id}" class="text-center">${stat.overall_rating}</td>
+                    <td contenteditable="true" data-field="appearances" data-stat-id="${stat.id}" class="text-center">${stat.appearances}</td>
+                    <td contenteditable="true" data-field="goals" data-stat-id="${stat.id}" class="text-center">${stat.goals}</td>
+                    <td contenteditable="true" data-field="assists" data-stat-id="${stat.id}" class="text-center">${stat.assists}</td>
+                    <td contenteditable="true" data-field="clean_sheets" data-stat-id="${stat.id}" class="text-center">${stat.clean_sheets}</td>
+                    <td contenteditable="true" data-field="yellow_cards" data-stat-id="${stat.id}" class="text-center">${stat.yellow_cards}</td>
+                    <td contenteditable="true" data-field="red_cards" data-stat-id="${stat.id}" class="text-center">${stat.red_cards}</td>
+                    <td contenteditable="true" data-field="average_rating" data-stat-id="${stat.id}" class="text-center">${stat.average_rating}</td>
+                    <td class="text-center">
+                        <button class="btn btn-sm btn-danger delete-player-btn" data-stat-id="${stat.id}">
+                            <i class="fas fa-trash"></i>
+                        </button>
+                    </td>
+                </tr>
+            `);
         });
+        
+        setupContentEditableHandlers();
     }
     
     // Function to reset the quick add form
@@ -484,50 +493,129 @@ $(document).ready(function() {
         });
     }
     
+    // Cell edits waiting to be sent, flushed together in one request
+    let pendingEdits = [];
+    let flushTimer = null;
+    let savingEdits = $.when(); // Settles once every batch sent so far has finished
+    const FLUSH_DELAY = 400;
+    
     // Function to save a player stat field
     function savePlayerStatField(statId, fieldName, value, element) {
         // Visual feedback - saving
         element.css('background-color', '#f0f8ff');
         
-        $.ajax({
-            url: "/api/player-stats/update/",
+        // A newer edit of the same cell replaces the queued one
+        pendingEdits = pendingEdits.filter(edit => !(edit.stat_id === statId && edit.field === fieldName));
+        pendingEdits.push({ stat_id: statId, field: fieldName, value: value, element: element });
+        
+        clearTimeout(flushTimer);
+        flushTimer = setTimeout(flushPlayerStatEdits, FLUSH_DELAY);
+    }
+    
+    function flashCell(element, color) {
+        element.css('background-color', color);
+        setTimeout(() => {
+            element.css('background-color', '');
+        }, 500);
+    }
+    
+    function batchUpdateBody(edits) {
+        return JSON.stringify({
+            edits: edits.map(edit => ({ stat_id: edit.stat_id, field: edit.field, value: edit.value }))
+        });
+    }
+    
+    function showBatchUpdateResults(edits, response) {
+        const errors = [];
+        response.results.forEach((result, index) => {
+            if (result.success) {
+                flashCell(edits[index].element, '#e6ffe6');
+            } else {
+                flashCell(edits[index].element, '#ffe6e6');
+                errors.push(result.error || 'Unknown error');
+            }
+        });
+        
+        // Cached seasons are stale now, refetch on the next switch
+        if (errors.length < edits.length) {
+            seasonCache = {};
+        }
+        if (errors.length) {
+            showAlert('Error saving: ' + [...new Set(errors)].join(', '), 'danger');
+        }
+    }
+    
+    // Take the queued edits off the queue and cancel the pending flush
+    function takePendingEdits() {
+        const edits = pendingEdits;
+        pendingEdits = [];
+        clearTimeout(flushTimer);
+        flushTimer = null;
+        return edits;
+    }
+    
+    // Send every queued edit in a single batch request. The returned promise
+    // settles once all edits made so far are saved, whether or not they failed
+    function flushPlayerStatEdits() {
+        const edits = takePendingEdits();
+        if (!edits.length) {
+            return savingEdits;
+        }
+        
+        const request = $.ajax({
+            url: "/api/player-stats/batch-update/",
             type: "POST",
-            data: JSON.stringify({
-                stat_id: statId,
-                field: fieldName,
-                value: value
-            }),
+            data: batchUpdateBody(edits),
             contentType: 'application/json',
             headers: {
                 'X-CSRFToken': $('input[name="csrfmiddlewaretoken"]').val()
             },
             success: function(response) {
-                if (response.success) {
-                    // Success feedback
-                    element.css('background-color', '#e6ffe6');
-                    setTimeout(() => {
-                        element.css('background-color', '');
-                    }, 500);
-                } else {
-                    // Error feedback
-                    element.css('background-color', '#ffe6e6');
-                    showAlert('Error saving: ' + (response.error || 'Unknown error'), 'danger');
-                    setTimeout(() => {
-                        element.css('background-color', '');
-                    }, 500);
-                }
+                showBatchUpdateResults(edits, response);
             },
             error: function() {
                 // Error feedback
-                element.css('background-color', '#ffe6e6');
-                showAlert('Error saving change. Please try again.', 'danger');
-                setTimeout(() => {
-                    element.css('background-color', '');
-                }, 500);
+                edits.forEach(edit => flashCell(edit.element, '#ffe6e6'));
+                showAlert('Error saving changes. Please try again.', 'danger');
             }
         });
+        // Failures are shown above, waiting callers only need the save to be over
+        savingEdits = $.when(savingEdits, request.catch(() => null));
+        return savingEdits;
     }
     
+    // Edits still waiting for the debounce timer would be lost when the page
+    // is closed, so send them with a keepalive request that outlives the page
+    function sendPendingEditsOnExit() {
+        const edits = takePendingEdits();
+        if (!edits.length) {
+            return;
+        }
+        const request = fetch("/api/player-stats/batch-update/", {
+            method: 'POST',
+            keepalive: true,
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': $('input[name="csrfmiddlewaretoken"]').val()
+            },
+            body: batchUpdateBody(edits)
+        }).then(response => response.json()).then(function(response) {
+            // Only reached if the page stayed open, e.g. the tab was just hidden
+            showBatchUpdateResults(edits, response);
+        }).catch(function() {
+            edits.forEach(edit => flashCell(edit.element, '#ffe6e6'));
+        });
+        savingEdits = $.when(savingEdits, request);
+    }
+    
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            sendPendingEditsOnExit();
+        }
+    });
+    window.addEventListener('beforeunload', sendPendingEditsOnExit);
+    
     // Function to show alerts
     function showAlert(message, type) {
         const alertHtml = `
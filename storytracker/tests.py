@@ -1,3 +1,397 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import time
+from unittest import mock
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from storytracker.models import (
+    Club, Competition, CompetitionPlayerStats, Player, PlayerStats, PlayerStatsQuerySet, Season, Story,
+    StorySummary, Transfer,
+)
+from storytracker.management.commands.import_players import (
+    CSV_COLUMNS, PlayerRowParser, PlayerWriter, parse_birth_date,
+)
+from storytracker.views import _etag_matches, batch_update_player_stats
+from storytracker.utils.csv_pipeline import ImportStats, RowParser, read_csv_batches
+from storytracker.utils.story_generator import BackgroundStreamCleaner, clean_background_response
 
-# Create your tests here.
+# Model responses the cleaner has to handle
+BACKGROUND_RESPONSES = [
+    "<h4>Club Backstory:</h4><p>Founded in 1899.</p><h4>League History:</h4><p>Old.</p>",
+    "Sure! Here is the history:\n\n<h4>Club Backstory:</h4><p>Founded.</p>\n",
+    "```html\n<h4>Club Backstory:</h4>\n<p>Founded.</p>\n```\nHope this helps!",
+    "<think>The user wants <h4>Club Backstory:</h4> sections.</think>\n<h4>Club Backstory:</h4><p>Real.</p>",
+    # Chat templates that add the opening tag leave only the closing one
+    "reasoning <h4>oops</h4></think><h4>Real</h4><p>Text.</p>",
+    "They asked for <h4>Club Backstory:</h4> and more.\n</think>\n\n```html\n<h4>Real</h4><p>Text.</p>\n```",
+    "plain reasoning only</think>Preamble <h4>Real</h4><p>Text `code` here.</p>",
+    "No headings at all, just a paragraph.",
+]
+
+
+def stream(cleaner, text, sizes):
+    """Feeds text to the cleaner in chunks of the given sizes, cycling"""
+    output = []
+    position = 0
+    index = 0
+    while position < len(text):
+        size = sizes[index % len(sizes)]
+        output.append(cleaner.feed(text[position:position + size]))
+        position += size
+        index += 1
+    output.append(cleaner.flush())
+    return output
+
+
+class BackgroundStreamCleanerTests(SimpleTestCase):
+    def test_chunked_stream_matches_batch_cleaner(self):
+        rng = random.Random(0)
+        for text in BACKGROUND_RESPONSES:
+            expected = clean_background_response(text)
+            for _ in range(200):
+                sizes = [rng.randint(1, 12) for _ in range(5)]
+                output = stream(BackgroundStreamCleaner(wait_for_think=True), text, sizes)
+                self.assertEqual(''.join(output), expected, (text, sizes))
+
+    def test_reasoning_is_never_streamed(self):
+        text = "reasoning <h4>oops</h4></think><h4>Real</h4><p>Text.</p>"
+        for size in range(1, len(text)):
+            output = stream(BackgroundStreamCleaner(wait_for_think=True), text, [size])
+            self.assertNotIn('oops', ''.join(output))
+            self.assertNotIn('</think>', ''.join(output))
+
+    def test_streams_before_the_response_ends(self):
+        text = "<h4>Club Backstory:</h4><p>" + "Founded long ago. " * 20 + "</p>"
+        output = stream(BackgroundStreamCleaner(wait_for_think=False), text, [10])
+        self.assertEqual(''.join(output), clean_background_response(text))
+        self.assertTrue(''.join(output[:-1]))
+        self.assertEqual(output[-1], '')
+
+    @override_settings(LLM_THINK_TAGS=False)
+    def test_default_holds_only_responses_that_open_with_think(self):
+        text = "<think>The user wants <h4>Club Backstory:</h4>.</think>\n<h4>Real</h4><p>Text.</p>"
+        for size in range(1, len(text)):
+            output = stream(BackgroundStreamCleaner(), text, [size])
+            self.assertEqual(''.join(output), clean_background_response(text), size)
+
+        text = "<h4>Club Backstory:</h4><p>" + "Founded long ago. " * 20 + "</p>"
+        output = stream(BackgroundStreamCleaner(), text, [10])
+        self.assertTrue(''.join(output[:-1]))
+
+
+def parse_test_row(row):
+    return {'age': int(row['age']), 'birth_date': parse_birth_date(row['birth_date'])}
+
+
+class RowParserTests(SimpleTestCase):
+    def test_short_rows_are_counted_as_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("name,age,birth_date\nA,20,01/02/03\nB\nC,21\nD,x,01/02/03\n")
+        self.addCleanup(os.remove, f.name)
+
+        stats = ImportStats()
+        records = []
+        for batch in read_csv_batches(f.name, batch_size=10):
+            records.extend(RowParser(parse_test_row)(batch, stats))
+
+        self.assertEqual([record['age'] for record in records], [20])
+        self.assertEqual(stats.errors, 3)
+        self.assertEqual([error['line'] for error in stats.error_samples], [3, 4, 5])
+
+
+class PlayerRowParserTests(SimpleTestCase):
+    def setUp(self):
+        self.parse_row = RowParser(PlayerRowParser({'Arsenal': 1}, set(), date(2024, 7, 1), date(2025, 6, 30)))
+        self.row = {
+            'Player ID': '1', 'Authentic Player Name Search': 'Striker', 'Club': 'Arsenal',
+            'Primary': 'ST', 'Secondary': '', 'Tertiary': '', 'Nationality': 'England',
+            'Birth Date': '01/01/00', 'Age': '24', 'Face Pic': '', 'Wage EUR': '1000',
+            'Wage USD': '1000', 'Wage GBP': '1000', 'Overall': '80',
+        }
+
+    def rules(self, *rows):
+        stats = ImportStats()
+        self.parse_row(list(enumerate(rows, start=2)), stats)
+        return [error['rules'] for error in stats.error_samples]
+
+    def test_short_rows_report_missing_columns(self):
+        truncated = dict(self.row, Club=None, **{column: None for column in CSV_COLUMNS[4:]})
+        self.assertEqual(self.rules(self.row, truncated), [['missing_columns']])
+        self.assertEqual(self.rules({'Player ID': '1'}), [['missing_columns']])
+
+    def test_blank_required_fields_are_reported(self):
+        self.assertEqual(self.rules(dict(self.row, Club='', Age=' ')), [['required_fields']])
+
+    def test_unknown_club(self):
+        self.assertEqual(self.rules(dict(self.row, Club='Chelsea')), [['club_exists']])
+
+
+class ETagMatchTests(SimpleTestCase):
+    def matches(self, if_none_match, etag='"abc"'):
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=if_none_match)
+        return _etag_matches(request, etag)
+
+    def test_weak_etag_from_gzipped_response_matches(self):
+        self.assertTrue(self.matches('W/"abc"'))
+        self.assertTrue(self.matches('"xyz", W/"abc"'))
+        self.assertTrue(self.matches('"abc"'))
+        self.assertTrue(self.matches('*'))
+
+    def test_other_etags_do_not_match(self):
+        self.assertFalse(self.matches('W/"abd"'))
+        self.assertFalse(self.matches(''))
+
+
+class BatchUpdatePlayerStatsTests(SimpleTestCase):
+    def test_malformed_stat_ids_get_per_edit_errors(self):
+        edits = [
+            {'stat_id': [1], 'field': 'goals', 'value': 1},
+            {'stat_id': {}},
+            {'stat_id': True, 'field': 'goals', 'value': 1},
+            {'stat_id': '1', 'field': 'goals', 'value': 1},
+            'not an edit',
+        ]
+        request = RequestFactory().post(
+            '/api/player-stats/batch-update/', json.dumps({'edits': edits}), content_type='application/json',
+        )
+        request.user = User(pk=1)
+
+        response = batch_update_player_stats(request)
+
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)['results']
+        self.assertEqual([result['error'] for result in results], ['Invalid stat_id'] * len(edits))
+
+class StoryDataTestCase(TestCase):
+    """One season of a story, with competition stats for one player and hand-entered totals for another"""
+
+    @classmethod
+    def setUpTestData(cls):
+        competition = dict(country='England', league_rep=5, min_wage_budget=Decimal('1000.00'))
+        cls.league = Competition.objects.create(name='Premier League', tier=1, **competition)
+        cls.cup = Competition.objects.create(name='FA Cup', tier=2, **competition)
+        club = Club.objects.create(
+            league=cls.league, name='Arsenal', overall=80, att_rating=80, mid_rating=80,
+            def_rating=80, country='England', scout_region='Europe', dom_prestige=9,
+            intl_prestige=8, league_rep=5, youth_scouting_region='Europe',
+        )
+        user = User.objects.create_user('manager', password='password')
+        cls.story = story = Story.objects.create(
+            user=user, club=club, name='Invincibles', formation='4-4-2', challenge='Win', background='',
+        )
+        cls.season = Season.objects.create(story=story, name='2024/25', season_number=1, notes='')
+
+        def player(player_id, name):
+            return Player.objects.create(
+                player_id=player_id, name=name, nationality='England', birth_date=date(2000, 1, 1),
+                age=24, club=club, wage_eur=1, wage_usd=1, wage_gbp=1, contract_start=date(2024, 7, 1),
+                contract_end=date(2025, 6, 30), overall=80, potential=85,
+            )
+
+        cls.striker = player(1, 'Striker')
+        cls.keeper = player(2, 'Keeper')
+        cls.striker_stats = PlayerStats.objects.create(story=story, season=cls.season, player=cls.striker)
+        # Entered by hand, with no competition stats behind it
+        cls.keeper_stats = PlayerStats.objects.create(
+            story=story, season=cls.season, player=cls.keeper, appearances=20, clean_sheets=9,
+            average_rating=Decimal('6.80'),
+        )
+        for competition, appearances, goals, rating in ((cls.league, 30, 10, '7.00'), (cls.cup, 5, 3, '8.50')):
+            CompetitionPlayerStats.objects.create(
+                story=story, season=cls.season, competition=competition, player=cls.striker,
+                appearances=appearances, goals=goals, yellow_cards=1, average_rating=Decimal(rating),
+            )
+
+
+
+class RecomputeFromCompetitionsTests(StoryDataTestCase):
+    def assertTotals(self, stats, appearances, goals, yellow_cards, average_rating):
+        stats.refresh_from_db()
+        self.assertEqual(
+            (stats.appearances, stats.goals, stats.yellow_cards, stats.average_rating),
+            (appearances, goals, yellow_cards, Decimal(average_rating)),
+        )
+
+    def test_totals_and_weighted_rating(self):
+        PlayerStats.objects.filter(pk=self.striker_stats.pk).update(appearances=0, goals=0, average_rating=0)
+
+        updated = PlayerStats.objects.filter(season=self.season).recompute_from_competitions()
+
+        self.assertEqual(updated, 1)
+        # (30 * 7.00 + 5 * 8.50) / 35, not the plain average of 7.75
+        self.assertTotals(self.striker_stats, 35, 13, 2, '7.21')
+
+    def test_rows_without_competition_stats_keep_their_totals(self):
+        PlayerStats.objects.filter(season=self.season).recompute_from_competitions()
+
+        self.assertTotals(self.keeper_stats, 20, 0, 0, '6.80')
+        self.assertEqual(self.keeper_stats.clean_sheets, 9)
+
+    def test_deleting_competition_rows_updates_totals(self):
+        CompetitionPlayerStats.objects.get(competition=self.cup).delete()
+        self.assertTotals(self.striker_stats, 30, 10, 1, '7.00')
+
+        # The last row is gone, so the totals drop to zero
+        CompetitionPlayerStats.objects.get(competition=self.league).delete()
+        self.assertTotals(self.striker_stats, 0, 0, 0, '0')
+
+
+class StorySummaryRefreshTests(StoryDataTestCase):
+    def refreshed_story_ids(self, write):
+        """Story ids refreshed by the commit hooks write() queues"""
+        with mock.patch.object(StorySummary, 'refresh') as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            write()
+        return [call.args[0] for call in refresh.call_args_list]
+
+    def test_writes_in_one_transaction_share_one_refresh(self):
+        def write():
+            for goals in range(5):
+                self.striker_stats.goals = goals
+                self.striker_stats.save()
+            CompetitionPlayerStats.objects.filter(competition=self.cup).get().delete()
+
+        self.assertEqual(self.refreshed_story_ids(write).count(self.story.pk), 1)
+
+    def test_rows_deleted_with_their_story_skip_recompute_and_refresh(self):
+        story_id = self.story.pk
+        with mock.patch.object(PlayerStatsQuerySet, 'recompute_from_competitions') as recompute:
+            refreshed = self.refreshed_story_ids(self.story.delete)
+
+        recompute.assert_not_called()
+        self.assertNotIn(story_id, refreshed)
+
+    def test_story_writes_refresh_again_after_a_delete(self):
+        other = Story.objects.create(
+            user=self.story.user, club=self.story.club, name='Other', formation='4-3-3', challenge='', background='',
+        )
+        other.delete()
+
+        self.assertEqual(self.refreshed_story_ids(self.striker_stats.save).count(self.story.pk), 1)
+
+class PlayerWriterTests(StoryDataTestCase):
+    PLAYERS = 1000
+
+    def records(self, suffix):
+        """Import records for PLAYERS players, with names and ratings that change with suffix"""
+        return [{
+            'player_id': 1000 + number,
+            'name': f"Player {number} {suffix}",
+            'slug': f"player-{number}-{suffix}",
+            'positions': ['ST', 'CAM'] if number % 2 else [],
+            'nationality': 'England',
+            'birth_date': date(2000, 1, 1),
+            'birth_year': 2000,
+            'age': 24,
+            'face_pic_url': '',
+            'club_id': self.story.club_id,
+            'wage_eur': 1000.0,
+            'wage_usd': 1100.0,
+            'wage_gbp': 900.0,
+            'contract_start': date(2024, 7, 1),
+            'contract_end': date(2025, 6, 30),
+            'contract_loan': False,
+            'overall': 60 + len(suffix),
+            'potential': 60 + len(suffix),
+            'import_source': 'TEST',
+            'import_hash': suffix,
+        } for number in range(self.PLAYERS)]
+
+    def test_updates_every_field_in_one_statement(self):
+        PlayerWriter()(self.records('old'), ImportStats())
+        stats = ImportStats()
+
+        # One lookup and one UPDATE, however many players change
+        with self.assertNumQueries(2):
+            PlayerWriter(delta=False)(self.records('newer'), stats)
+
+        self.assertEqual((stats.created, stats.updated), (0, self.PLAYERS))
+        player = Player.objects.get(player_id=1001)
+        self.assertEqual(
+            (player.name, player.positions, player.overall, player.wage_eur, player.import_hash),
+            ('Player 1 newer', ['ST', 'CAM'], 65, Decimal('1000.00'), 'newer'),
+        )
+        self.assertEqual(Player.objects.get(player_id=1000).positions, [])
+
+    def test_update_is_much_faster_than_update_or_create(self):
+        PlayerWriter()(self.records('old'), ImportStats())
+
+        started = time.perf_counter()
+        PlayerWriter(delta=False)(self.records('newer'), ImportStats())
+        bulk_seconds = time.perf_counter() - started
+
+        # The importer this replaced, one update_or_create per row
+        started = time.perf_counter()
+        for record in self.records('newest'):
+            Player.objects.update_or_create(
+                player_id=record['player_id'],
+                defaults={field: record[field] for field in record if field != 'player_id'},
+            )
+        row_seconds = time.perf_counter() - started
+
+        self.assertLess(bulk_seconds * 5, row_seconds, (bulk_seconds, row_seconds))
+
+
+class SeasonPlayerStatsOrderTests(StoryDataTestCase):
+    def setUp(self):
+        self.client.login(username='manager', password='password')
+        self.url = reverse('api_season_player_stats', args=[self.season.pk])
+
+    def test_descending_order(self):
+        response = self.client.get(self.url, {'fields': 'player_name', 'order': '-player_name'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [stat['player_name'] for stat in json.loads(response.content)['player_stats']], ['Striker', 'Keeper'],
+        )
+
+    def test_repeated_minus_is_rejected(self):
+        for order in ('--goals', '-', '-goals,---assists'):
+            response = self.client.get(self.url, {'order': order})
+            self.assertEqual(response.status_code, 400, order)
+
+
+class SeasonTransfersETagTests(StoryDataTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.seller = Club.objects.create(
+            league=cls.league, name='Chelsea', overall=78, att_rating=78, mid_rating=78,
+            def_rating=78, country='England', scout_region='Europe', dom_prestige=8,
+            intl_prestige=8, league_rep=5, youth_scouting_region='Europe',
+        )
+        cls.transfer = Transfer.objects.create(
+            season=cls.season, story=cls.story, player=cls.striker, from_club=cls.seller,
+            to_club=cls.story.club, fee=Decimal('1000000.00'), transfer_date=date(2024, 8, 1),
+        )
+
+    def setUp(self):
+        self.client.login(username='manager', password='password')
+        self.url = reverse('get_season_transfers', args=[self.season.pk])
+
+    def revalidate(self):
+        etag = self.client.get(self.url)['ETag']
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_transfers_return_304(self):
+        self.assertEqual(self.revalidate().status_code, 304)
+
+    def test_renamed_club_returns_200(self):
+        etag = self.client.get(self.url)['ETag']
+        Club.objects.filter(pk=self.seller.pk).update(name='Chelsea FC')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['transfers_in'][0]['from_club'], 'Chelsea FC')
+
+    def test_edited_transfer_date_returns_200(self):
+        etag = self.client.get(self.url)['ETag']
+        Transfer.objects.filter(pk=self.transfer.pk).update(transfer_date=date(2024, 8, 2))
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from storytracker.models import ClubBackground
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'BACKGROUND_CACHE_TTL', 30 * 24 * 60 * 60)
+
+
+def _variants():
+    return max(1, getattr(settings, 'BACKGROUND_CACHE_VARIANTS', 1))
+
+
+def _lru_get(key):
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        expires_at, pool = entry
+        if expires_at < time.monotonic():
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return pool
+
+
+def _lru_put(key, pool):
+    with _lru_lock:
+        # Incomplete pools aren't kept, so variants written by other
+        # processes (e.g. prewarm_backgrounds) are seen on the next call
+        if len(pool) < _variants():
+            _lru.pop(key, None)
+            return
+        _lru[key] = (time.monotonic() + _ttl(), pool)
+        _lru.move_to_end(key)
+        while len(_lru) > getattr(settings, 'BACKGROUND_CACHE_LRU_SIZE', 256):
+            _lru.popitem(last=False)
+
+
+def _fresh_rows(club_id, prompt_hash, model_name):
+    return ClubBackground.objects.filter(
+        club_id=club_id,
+        prompt_hash=prompt_hash,
+        model_name=model_name,
+        created_at__gte=timezone.now() - timedelta(seconds=_ttl()),
+    )
+
+
+def get_cached_background(club_id, prompt_hash, model_name):
+    """
+    Returns a cached background for the club, or None if one should be generated.
+
+    Backgrounds are only served once the club's variant pool
+    (BACKGROUND_CACHE_VARIANTS) is full, so popular clubs still get a few
+    different histories before repeats kick in.
+    """
+    key = (club_id, prompt_hash, model_name)
+    pool = _lru_get(key)
+    if pool is None:
+        pool = list(
+            _fresh_rows(club_id, prompt_hash, model_name)
+            .order_by('-created_at')
+            .values_list('html', flat=True)[:_variants()]
+        )
+        _lru_put(key, pool)
+
+    if len(pool) < _variants():
+        return None
+    return random.choice(pool)
+
+
+def missing_variants(club_id, prompt_hash, model_name):
+    """Number of backgrounds still needed to fill the club's variant pool"""
+    fresh = _fresh_rows(club_id, prompt_hash, model_name).count()
+    return max(0, _variants() - fresh)
+
+
+def store_background(club_id, prompt_hash, model_name, html):
+    """Saves a generated background and evicts expired or surplus variants"""
+    if not html:
+        return
+    ClubBackground.objects.create(
+        club_id=club_id, prompt_hash=prompt_hash, model_name=model_name, html=html
+    )
+
+    rows = ClubBackground.objects.filter(club_id=club_id)
+    keep = list(
+        _fresh_rows(club_id, prompt_hash, model_name)
+        .order_by('-created_at')
+        .values_list('id', flat=True)[:_variants()]
+    )
+    # Anything else for this club is stale: expired, surplus or from an old prompt/model
+    rows.exclude(id__in=keep).delete()
+
+    pool = list(
+        ClubBackground.objects.filter(id__in=keep).values_list('html', flat=True)
+    )
+    _lru_put((club_id, prompt_hash, model_name), pool)
+
+
+def clear_lru():
+    """Empties the in-process cache, e.g. after backgrounds are edited in bulk"""
+    with _lru_lock:
+        _lru.clear()
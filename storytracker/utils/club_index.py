@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+from itertools import accumulate
+from django.conf import settings
+from storytracker.models import Club
+from storytracker.utils import shared_version
+
+# Club fields that can be used to weight random selection
+WEIGHT_FIELDS = ('overall', 'dom_prestige')
+
+_lock = threading.Lock()
+_index = None
+_loaded_at = 0.0
+_version = shared_version.VersionCheck('club-index')
+
+
+def _load():
+    """Builds the id array and cumulative weights from a single query"""
+    rows = list(Club.objects.order_by('id').values_list('id', *WEIGHT_FIELDS))
+    ids = tuple(row[0] for row in rows)
+    cum_weights = {
+        field: tuple(accumulate(max(row[i + 1], 0) for row in rows))
+        for i, field in enumerate(WEIGHT_FIELDS)
+    }
+    return {'ids': ids, 'cum_weights': cum_weights}
+
+
+def _get_index():
+    global _index, _loaded_at
+    ttl = getattr(settings, 'CLUB_INDEX_TTL', 300)
+    with _lock:
+        if _index is None or time.monotonic() - _loaded_at > ttl or not _version.is_current():
+            # Read the version first, so a bump during the load triggers another
+            version = shared_version.current(*_version.names)
+            _index = _load()
+            _version.mark(version)
+            _loaded_at = time.monotonic()
+        return _index
+
+
+def invalidate():
+    """
+    Drops the index in every process so the next pick reloads it, e.g.
+    after clubs are imported by manage.py.
+    """
+    global _index
+    shared_version.bump(*_version.names)
+    with _lock:
+        _index = None
+
+
+def random_club_id(weight_by=None):
+    """
+    Returns a random club id, or None if there are no clubs.
+
+    Args:
+        weight_by (str): Optional field from WEIGHT_FIELDS to weight the pick
+        by, so stronger clubs come up more often.
+    """
+    if weight_by is not None and weight_by not in WEIGHT_FIELDS:
+        raise ValueError(f"Cannot weight clubs by '{weight_by}'")
+
+    index = _get_index()
+    if not index['ids']:
+        return None
+    if weight_by is None:
+        return random.choice(index['ids'])
+    cum_weights = index['cum_weights'][weight_by]
+    if not cum_weights[-1]:
+        return random.choice(index['ids'])
+    return random.choices(index['ids'], cum_weights=cum_weights)[0]
@@ -0,0 +1,282 @@
+"""
+Streaming CSV ingestion shared by the import commands.
+
+An import is a pipeline of stages:
+
+    reader  -> yields batches of rows (dict rows or pandas DataFrames)
+    parse   -> turns a batch into records ready to write, collecting errors
+    write   -> bulk writes the records, inside one transaction per batch
+
+Only one batch (two per worker when parsing in parallel) is held in memory
+at a time, so files of any size can be imported, and each committed batch
+survives a failure in a later one.
+"""
+import csv
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connections, router, transaction
+import pandas as pd
+
+
+class RowValidationError(ValueError):
+    """Raised by a parse stage when a row breaks one or more named rules"""
+
+    def __init__(self, rules, message=None):
+        self.rules = list(rules)
+        super().__init__(message or f"Failed rules: {', '.join(self.rules)}")
+
+
+class ImportStats:
+    """
+    Counters collected while an import runs.
+
+    Args:
+        max_errors (int): Error details kept for the report, None keeps all.
+        Every error is still counted.
+    """
+
+    def __init__(self, max_errors=100):
+        self.rows = 0
+        self.valid = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_errors = max_errors
+        self.error_samples = []
+        self.started = time.monotonic()
+
+    def add_error(self, line, error):
+        self.errors += 1
+        if self.max_errors is None or len(self.error_samples) < self.max_errors:
+            self.error_samples.append({
+                'line': line,
+                'rules': getattr(error, 'rules', []),
+                'message': str(error),
+            })
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def progress(self):
+        return f"Processed {self.rows} rows in {self.batches} batches..."
+
+    def summary(self):
+        rate = self.rows / self.elapsed if self.elapsed else 0
+        return (
+            f"{self.rows} rows in {self.elapsed:.1f}s ({rate:.0f} rows/s): "
+            f"{self.created} created, {self.updated} updated, {self.unchanged} unchanged, "
+            f"{self.skipped} skipped, {self.errors} errors"
+        )
+
+    def report(self):
+        """Machine-readable summary, including the kept error details"""
+        rule_counts = {}
+        for error in self.error_samples:
+            for rule in error['rules']:
+                rule_counts[rule] = rule_counts.get(rule, 0) + 1
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'skipped': self.skipped,
+            'error_count': self.errors,
+            'rule_counts': rule_counts,
+            'errors': self.error_samples,
+            'seconds': round(self.elapsed, 3),
+        }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def read_csv_batches(path, batch_size, encoding='utf-8'):
+    """Reader stage for dict rows, yields lists of (line number, row)"""
+    with open(path, encoding=encoding, newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        batch = []
+        for row in reader:
+            batch.append((reader.line_num, row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def read_frame_batches(path, batch_size):
+    """Reader stage for vectorized imports, yields DataFrames of batch_size rows"""
+    yield from pd.read_csv(path, chunksize=batch_size)
+
+
+class RowParser:
+    """
+    Parse stage built from a per-row function.
+
+    parse_row(row) returns a record, or None to skip the row, and raises
+    ValueError, KeyError or TypeError for invalid rows. Rows shorter than
+    the header have None for the missing fields, so TypeError covers them. parse_row must be picklable
+    (a module-level function or class instance) to run with workers.
+    """
+
+    def __init__(self, parse_row):
+        self.parse_row = parse_row
+
+    def __call__(self, batch, stats):
+        records = []
+        for line, row in batch:
+            try:
+                record = self.parse_row(row)
+            except (ValueError, KeyError, TypeError) as e:
+                stats.add_error(line, e)
+                continue
+            if record is None:
+                stats.skipped += 1
+            else:
+                records.append(record)
+        return records
+
+
+def parse_rows(parse_row):
+    """Builds a parse stage from a per-row function, see RowParser"""
+    return RowParser(parse_row)
+
+
+# Parse stage of the pool worker, sent once per process rather than per batch
+_worker_parse = None
+
+
+def _init_worker(parse):
+    global _worker_parse
+    _worker_parse = parse
+
+
+def _parse_in_worker(batch):
+    # Keep every error here, the parent applies its own limit when merging
+    stats = ImportStats(max_errors=None)
+    records = _worker_parse(batch, stats)
+    return len(batch), records, stats.skipped, stats.errors, stats.error_samples
+
+
+def _parse_serial(batches, parse, stats):
+    for batch in batches:
+        stats.rows += len(batch)
+        yield parse(batch, stats)
+
+
+def _parse_parallel(batches, parse, stats, workers):
+    """
+    Parses batches in a process pool and yields results in input order.
+
+    At most two batches per worker are in flight, so memory stays bounded
+    and the writer sees exactly the order a serial run would.
+    """
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(parse,)) as executor:
+        for batch in batches:
+            pending.append(executor.submit(_parse_in_worker, batch))
+            if len(pending) >= workers * 2:
+                yield _merge_worker_result(pending.popleft().result(), stats)
+        while pending:
+            yield _merge_worker_result(pending.popleft().result(), stats)
+
+
+def _merge_worker_result(result, stats):
+    rows, records, skipped, errors, error_samples = result
+    stats.rows += rows
+    stats.skipped += skipped
+    stats.errors += errors
+    if stats.max_errors is not None:
+        error_samples = error_samples[:max(stats.max_errors - len(stats.error_samples), 0)]
+    stats.error_samples.extend(error_samples)
+    return records
+
+
+def bulk_update_values(objs, fields, chunk_size=1000):
+    """
+    Write fields of existing model instances with one UPDATE ... FROM
+    (VALUES ...) statement per chunk, matched on the primary key.
+
+    Django's bulk_update builds a CASE WHEN expression per field over every
+    row, which costs about as much as saving rows one by one once a batch
+    rewrites many columns. Here each row is one tuple of parameters.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    if not objs:
+        return 0
+    meta = objs[0]._meta
+    fields = [meta.pk] + [meta.get_field(name) for name in fields]
+    connection = connections[router.db_for_write(meta.model)]
+    quote = connection.ops.quote_name
+
+    columns = ', '.join(quote(field.column) for field in fields)
+    # Parameters arrive untyped, so cast each one to its column's type
+    assignments = ', '.join(
+        f"{quote(field.column)} = v.{quote(field.column)}::{field.db_type(connection)}"
+        for field in fields[1:]
+    )
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    pk = quote(meta.pk.column)
+
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), chunk_size):
+            chunk = objs[start:start + chunk_size]
+            params = [
+                field.get_db_prep_save(getattr(obj, field.attname), connection)
+                for obj in chunk for field in fields
+            ]
+            cursor.execute(
+                f"UPDATE {quote(meta.db_table)} SET {assignments} "
+                f"FROM (VALUES {', '.join([row_sql] * len(chunk))}) AS v ({columns}) "
+                f"WHERE {quote(meta.db_table)}.{pk} = v.{pk}::{meta.pk.rel_db_type(connection)}",
+                params,
+            )
+            updated += cursor.rowcount
+    return updated
+
+
+def run_pipeline(batches, parse, write, stats=None, progress=None, workers=1, dry_run=False):
+    """
+    Runs every batch through the parse and write stages.
+
+    Args:
+        batches: Iterable from a reader stage.
+        parse: parse(batch, stats) -> records.
+        write: write(records, stats), called inside a transaction.
+        stats (ImportStats): Counters to update, a new one if not given.
+        progress: Optional callable given the stats after each batch.
+        workers (int): Parse batches in this many processes. Writes always
+        happen in this process, one batch at a time.
+        dry_run (bool): Only read and validate, the write stage is skipped.
+
+    Returns:
+        ImportStats: The final counters.
+    """
+    stats = stats or ImportStats()
+    if workers > 1:
+        parsed = _parse_parallel(batches, parse, stats, workers)
+    else:
+        parsed = _parse_serial(batches, parse, stats)
+
+    for records in parsed:
+        stats.valid += len(records)
+        if not dry_run:
+            with transaction.atomic():
+                write(records, stats)
+        stats.batches += 1
+        if progress:
+            progress(stats)
+    return stats
@@ -0,0 +1,113 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+# Job states reported to polling clients
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+# Id of the job running in the current worker thread
+_current = threading.local()
+
+
+def _get_executor():
+    """Lazily create this process's worker pool sized from settings"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'STORY_JOB_WORKERS', 2),
+                    thread_name_prefix='story-job',
+                )
+    return _executor
+
+
+def _ttl():
+    return getattr(settings, 'STORY_JOB_TTL', 600)
+
+
+def _job_key(job_id):
+    return f"story-job:{job_id}"
+
+
+def update_job(job_id, **fields):
+    """
+    Merge fields into the job's shared state.
+
+    Only the worker running a job writes to it, so a read-modify-write is
+    safe. Each write renews the job's STORY_JOB_TTL.
+    """
+    job = cache.get(_job_key(job_id)) or {}
+    job.update(fields)
+    cache.set(_job_key(job_id), job, _ttl())
+
+
+def report_progress(result):
+    """Publish a partial result of the job running in this thread, returned to polls while it runs"""
+    update_job(_current.job_id, result=result)
+
+
+def _acquire_slot(job_id):
+    """
+    Wait for one of the STORY_JOB_MAX_RUNNING slots shared by every process.
+
+    Slots are cache keys claimed with add(), so the cap holds across worker
+    processes. A slot left by a crashed worker expires after STORY_JOB_TTL.
+    """
+    slots = getattr(settings, 'STORY_JOB_MAX_RUNNING', 2)
+    while True:
+        for slot in range(slots):
+            key = f"story-job-slot:{slot}"
+            if cache.add(key, job_id, _ttl()):
+                return key
+        time.sleep(0.5)
+
+
+def _run_job(job_id, func, args, kwargs):
+    slot = None
+    _current.job_id = job_id
+    try:
+        slot = _acquire_slot(job_id)
+        update_job(job_id, status=RUNNING)
+        result = func(*args, **kwargs)
+    except Exception as e:
+        update = {'status': FAILED, 'error': str(e)}
+    else:
+        update = {'status': DONE, 'result': result}
+    try:
+        update_job(job_id, **update)
+        if slot and cache.get(slot) == job_id:
+            cache.delete(slot)
+    finally:
+        # Worker threads hold their own DB connection, release it after each job
+        close_old_connections()
+
+
+def submit_job(func, *args, **kwargs):
+    """
+    Queue func(*args, **kwargs) on the background worker pool.
+
+    The job runs in this process, but its state lives in the shared cache,
+    so any worker process can answer a poll for it.
+
+    Returns:
+        str: The id used to poll the job with get_job().
+    """
+    job_id = uuid.uuid4().hex
+    update_job(job_id, status=PENDING, result=None, error=None)
+    _get_executor().submit(_run_job, job_id, func, args, kwargs)
+    return job_id
+
+
+def get_job(job_id):
+    """Returns the job's state, or None if it is unknown or expired"""
+    return cache.get(_job_key(job_id))
@@ -0,0 +1,164 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from django.conf import settings
+from django.db import connection
+from storytracker.models import Player
+from storytracker.utils import shared_version
+
+# Letters NFKD does not split into a base letter and an accent
+_FOLD = str.maketrans({
+    'ø': 'o', 'đ': 'd', 'ð': 'd', 'ł': 'l', 'ı': 'i', 'þ': 'th',
+    'æ': 'ae', 'œ': 'oe', 'ß': 'ss',
+})
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Held while an index is built, so only one build runs at a time
+_build_lock = threading.Lock()
+_index = None
+_loaded_at = 0.0
+_stale = False
+_version = shared_version.VersionCheck('player-index')
+
+
+def normalize(text):
+    """Lowercase text with accents removed, so 'Ødegaard' and 'odegaard' match"""
+    text = unicodedata.normalize('NFKD', text.casefold().translate(_FOLD))
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _TOKEN.findall(normalize(text))
+
+
+def _load():
+    """
+    Builds the index from a single query.
+
+    Every word of every name goes into one sorted array of (word, row), so
+    all names with a word starting with a prefix sit in one contiguous slice
+    found by binary search, the same lookup a trie gives in far less memory.
+    """
+    rows = []
+    words = []
+    for player_id, name, overall, club_id in Player.objects.values_list('id', 'name', 'overall', 'club_id'):
+        tokens = tuple(tokenize(name))
+        row = len(rows)
+        rows.append((player_id, name, overall, club_id, ' '.join(tokens), tokens))
+        words.extend((token, row) for token in set(tokens))
+    words.sort()
+    return {'rows': rows, 'words': [word for word, _ in words], 'word_rows': [row for _, row in words]}
+
+
+def _build():
+    global _index, _loaded_at, _stale
+    # Read the version first, so a bump during the build triggers another
+    version = shared_version.current(*_version.names)
+    index = _load()
+    _version.mark(version)
+    _index, _loaded_at, _stale = index, time.monotonic(), False
+
+
+def _rebuild_in_background():
+    """Start a rebuild unless one is running, searches keep the old index meanwhile"""
+    if not _build_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            _build()
+        finally:
+            _build_lock.release()
+            # The thread's own connection would otherwise stay open
+            connection.close()
+
+    threading.Thread(target=run, name='player-index', daemon=True).start()
+
+
+def _get_index():
+    global _stale
+    if _index is None:
+        # Nothing to serve yet, so the very first search waits for the build
+        with _build_lock:
+            if _index is None:
+                _build()
+        return _index
+
+    age = time.monotonic() - _loaded_at
+    if age > getattr(settings, 'PLAYER_INDEX_TTL', 600) or not _version.is_current():
+        _stale = True
+    # Rebuild at most every PLAYER_INDEX_REBUILD_INTERVAL, so a burst of
+    # player saves costs one rebuild rather than one per save
+    if _stale and age >= getattr(settings, 'PLAYER_INDEX_REBUILD_INTERVAL', 5):
+        _rebuild_in_background()
+    return _index
+
+
+def invalidate():
+    """
+    Marks the index stale in every process, e.g. after players are imported.
+
+    Each process rebuilds in the background on its next search and serves
+    the previous index until the new one is ready.
+    """
+    shared_version.bump(*_version.names)
+
+
+def _rank(row, query, query_tokens, club_id):
+    player_id, name, overall, row_club_id, folded, tokens = row
+    if folded == query:
+        match = 0
+    elif folded.startswith(query):
+        match = 1
+    elif tokens[0].startswith(query_tokens[0]):
+        match = 2
+    else:
+        match = 3
+    # Lower sorts first: own club, closeness of the match, then rating
+    return (row_club_id != club_id, match, -overall, name)
+
+
+def search(query, limit=10, club_id=None):
+    """
+    Players whose name matches every word of the query as a prefix.
+
+    Matching ignores case and accents. Results are ranked with players at
+    club_id first, then exact names, names starting with the query, names
+    whose first word matches, and finally by overall rating.
+
+    Returns:
+        list: Dicts with id, name, overall and club_id.
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return []
+    index = _get_index()
+    words = index['words']
+
+    # Walk the slice of the most selective word, then check the others
+    lead = max(query_tokens, key=len)
+    others = [token for token in query_tokens if token != lead]
+    start = bisect_left(words, lead)
+    end = bisect_left(words, lead + '\uffff', start)
+
+    matches = []
+    seen = set()
+    for row_number in index['word_rows'][start:end]:
+        if row_number in seen:
+            continue
+        seen.add(row_number)
+        row = index['rows'][row_number]
+        if all(any(token.startswith(other) for token in row[5]) for other in others):
+            matches.append(row)
+
+    query = ' '.join(query_tokens)
+    best = heapq.nsmallest(limit, matches, key=lambda row: _rank(row, query, query_tokens, club_id))
+    return [{
+        'id': player_id,
+        'name': name,
+        'overall': overall,
+        'club_id': row_club_id
+    } for player_id, name, overall, row_club_id, _, _ in best]
@@ -0,0 +1,57 @@
+"""
+Version tokens in the shared cache for the in-process indexes.
+
+Each web process keeps its own copy of an index together with the version
+it was built at. Writers, including manage.py commands, bump the version
+and every process sees the change on its next check, at most
+SHARED_VERSION_CHECK_INTERVAL seconds later.
+"""
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(name):
+    return f"version:{name}"
+
+
+def check_interval():
+    return getattr(settings, 'SHARED_VERSION_CHECK_INTERVAL', 1)
+
+
+def current(*names):
+    """The current version of each name, None for names never bumped"""
+    versions = cache.get_many([_key(name) for name in names])
+    return tuple(versions.get(_key(name)) for name in names)
+
+
+def bump(*names):
+    """Give each name a new version, so every process rebuilds its copy"""
+    cache.set_many({_key(name): uuid.uuid4().hex for name in names}, None)
+
+
+class VersionCheck:
+    """
+    Remembers the version an in-process copy was built at and rate limits
+    the shared cache reads needed to tell whether it is still current.
+    """
+
+    def __init__(self, *names):
+        self.names = names
+        self.version = None
+        self.checked_at = float('-inf')
+
+    def is_current(self):
+        """True if nothing was bumped since mark(), checking the cache at most once per interval"""
+        now = time.monotonic()
+        if now - self.checked_at < check_interval():
+            return True
+        version = current(*self.names)
+        self.checked_at = now
+        return version == self.version
+
+    def mark(self, version):
+        """Record the version a fresh copy was built at, read with current() before building"""
+        self.version = version
+        self.checked_at = time.monotonic()
@@ -0,0 +1,110 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from django.conf import settings
+from storytracker.models import Player
+from storytracker.utils import shared_version
+
+# (club id, position or None) -> (expires at, version check, sort keys, rows)
+_squads = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'SQUAD_CACHE_TTL', 300)
+
+
+def _version_names(club_id):
+    return ('squads', f"squad:{club_id}")
+
+
+def _load(club_id, position):
+    """The club's squad as dicts, one values query with no model instances"""
+    players = Player.objects.filter(club_id=club_id)
+    if position:
+        players = players.filter(positions__contains=[position])
+    rows = tuple({
+        'id': player_id,
+        'name': name,
+        'overall': overall,
+        'positions': positions
+    } for player_id, name, overall, positions in players.order_by('-overall', 'id').values_list(
+        'id', 'name', 'overall', 'positions'
+    ))
+    # Sort keys of the rows, used to find the start of a page by cursor
+    keys = tuple((-row['overall'], row['id']) for row in rows)
+    return keys, rows
+
+
+def _get(club_id, position=None):
+    key = (club_id, position)
+    with _lock:
+        entry = _squads.get(key)
+    if entry is not None and entry[0] >= time.monotonic() and entry[1].is_current():
+        with _lock:
+            if key in _squads:
+                _squads.move_to_end(key)
+        return entry[2], entry[3]
+
+    # Read the version first, so a bump during the load triggers another
+    check = shared_version.VersionCheck(*_version_names(club_id))
+    version = shared_version.current(*check.names)
+    keys, rows = _load(club_id, position)
+    check.mark(version)
+    with _lock:
+        _squads[key] = (time.monotonic() + _ttl(), check, keys, rows)
+        _squads.move_to_end(key)
+        while len(_squads) > getattr(settings, 'SQUAD_CACHE_SIZE', 512):
+            _squads.popitem(last=False)
+    return keys, rows
+
+
+def get_squad(club_id, position=None):
+    """Every player at the club, best first, optionally only those who play position"""
+    return list(_get(club_id, position)[1])
+
+
+def get_squad_page(club_id, position=None, cursor=None, limit=50):
+    """
+    One page of the club's squad, ordered by overall then id.
+
+    Args:
+        cursor (str): next_cursor from the previous page, None for the first.
+        limit (int): Players per page.
+
+    Returns:
+        tuple: (players, next_cursor), next_cursor is None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    keys, rows = _get(club_id, position)
+    start = 0
+    if cursor:
+        overall, player_id = (int(part) for part in cursor.split(':'))
+        start = bisect_right(keys, (-overall, player_id))
+
+    page = rows[start:start + limit]
+    next_cursor = None
+    if page and start + limit < len(rows):
+        next_cursor = f"{page[-1]['overall']}:{page[-1]['id']}"
+    return list(page), next_cursor
+
+
+def invalidate(club_ids=None):
+    """
+    Marks the squads of the given clubs, or of every club if None, as stale.
+
+    Called when players are saved, deleted or re-imported. The version is
+    bumped in the shared cache, so every web process reloads the squad on
+    its next version check, including after imports run by manage.py.
+    """
+    if club_ids is None:
+        shared_version.bump('squads')
+    else:
+        club_ids = set(club_ids)
+        shared_version.bump(*(f"squad:{club_id}" for club_id in club_ids))
+    with _lock:
+        for key in [key for key in _squads if club_ids is None or key[0] in club_ids]:
+            del _squads[key]
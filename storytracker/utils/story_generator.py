@@ -1,21 +1,84 @@
+import hashlib
 import os
 import random
+import threading
+import time
+from contextlib import contextmanager
 from openai import OpenAI
 from django.conf import settings
 from storytracker.models import Club, Competition  # Import the Club and Competition models
+from storytracker.utils.background_cache import get_cached_background, store_background
+from storytracker.utils import club_index
 
-def get_random_item(file_path):
+FORMATIONS_FILE = 'fifaFormations.txt'
+CHALLENGES_FILE = 'fifaChallenges.txt'
+
+# file path -> (mtime, last mtime check, items)
+_item_lists = {}
+_item_lists_lock = threading.Lock()
+
+def get_data_path(file_name):
+    return os.path.join(settings.BASE_DIR, 'storytracker/data', file_name)
+
+def load_item_list(file_path):
+    """Read a list file into an immutable tuple of its non-blank lines"""
     with open(file_path, 'r') as f:
-        return random.choice(f.readlines()).strip()
+        return tuple(line.strip() for line in f if line.strip())
 
-def get_random_club_from_db():
-    """Get a random club from the database"""
-    count = Club.objects.count()
-    if count == 0:
-        return "No clubs in database"
-    
-    random_index = random.randint(0, count - 1)
-    return Club.objects.all()[random_index]
+def get_item_list(file_path):
+    """
+    Returns the cached lines of a list file.
+
+    The file's mtime is checked at most every STORY_LISTS_RELOAD_INTERVAL
+    seconds and the list is reloaded when it changes, so edits are picked up
+    without a restart while most calls do no file I/O at all.
+    """
+    now = time.monotonic()
+    entry = _item_lists.get(file_path)
+    interval = getattr(settings, 'STORY_LISTS_RELOAD_INTERVAL', 60)
+    if entry is not None and now - entry[1] < interval:
+        return entry[2]
+
+    with _item_lists_lock:
+        entry = _item_lists.get(file_path)
+        mtime = os.path.getmtime(file_path)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, now, load_item_list(file_path))
+        else:
+            entry = (mtime, now, entry[2])
+        _item_lists[file_path] = entry
+    return entry[2]
+
+def preload_item_lists():
+    """Load the formation and challenge lists up front, called at app startup"""
+    for file_name in (FORMATIONS_FILE, CHALLENGES_FILE):
+        try:
+            get_item_list(get_data_path(file_name))
+        except OSError:
+            # Missing files only matter once a story is generated
+            pass
+
+def get_random_item(file_path):
+    return random.choice(get_item_list(file_path))
+
+def get_random_club_from_db(weight_by=None):
+    """
+    Get a random club from the database with a single primary key lookup.
+
+    Args:
+        weight_by (str): Optional 'overall' or 'dom_prestige' to favour
+        stronger clubs.
+    """
+    # Retry once in case the club was deleted by another process
+    for _ in range(2):
+        club_id = club_index.random_club_id(weight_by)
+        if club_id is None:
+            return "No clubs in database"
+        club = Club.objects.filter(pk=club_id).first()
+        if club is not None:
+            return club
+        club_index.invalidate()
+    return "No clubs in database"
 
 def generate_club_history_prompt(randomClub: str) -> str:
     return f"""
@@ -48,38 +111,287 @@ def generate_club_history_prompt(randomClub: str) -> str:
     Ensure this reads like a historian’s perspective, rather than a generic summary. </p> 
     """
 
-def generate_club_background(club):
-    client = OpenAI(base_url="http://192.168.0.107:1234/v1", api_key="lm-studio")
-    
-    response = client.chat.completions.create(
-        model='your-model',
-        messages=[{"role": "user", "content": generate_club_history_prompt(club)}],
-        stream=False
-    )
-    final = response.choices[0].message.content
-    
+def get_prompt_hash():
+    """Hash of the prompt template, changes whenever the prompt text is edited"""
+    return hashlib.sha256(generate_club_history_prompt('{club}').encode('utf-8')).hexdigest()
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+_llm_slots = None
+
+def get_llm_client():
+    """
+    Returns the shared LLM client, created on first use.
+
+    Reusing one client keeps its HTTP connections alive between requests.
+    The client retries failed calls up to LLM_MAX_RETRIES times with
+    exponential backoff and gives up after LLM_TIMEOUT seconds.
+    """
+    global _llm_client, _llm_slots
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+                _llm_client = OpenAI(
+                    base_url=settings.LLM_BASE_URL,
+                    api_key=settings.LLM_API_KEY,
+                    timeout=settings.LLM_TIMEOUT,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                )
+    return _llm_client
+
+@contextmanager
+def llm_slot():
+    """Limits in-flight requests to the model server to LLM_MAX_CONCURRENCY"""
+    get_llm_client()
+    if not _llm_slots.acquire(timeout=settings.LLM_TIMEOUT):
+        raise RuntimeError("The story generator is busy, please try again shortly")
+    try:
+        yield
+    finally:
+        _llm_slots.release()
+
+def clean_background_response(text):
+    """Strip think-blocks, preamble and code fences from a model response"""
     # Remove any prefixes before the first <h4> tag
-    if '<h4>' in final:
-        final = final[final.find('<h4>'):]
+    if '<h4>' in text:
+        text = text[text.find('<h4>'):]
     
     # Clean up any other potential markers
-    noThinkResponse = final.split('</think>')[-1].strip()
+    noThinkResponse = text.split('</think>')[-1].strip()
     noHTMLResponse = noThinkResponse.split('```html')[-1].strip()
-    cleanResponse = noHTMLResponse.split('```')[0].strip()
+    return noHTMLResponse.split('```')[0].strip()
+
+class BackgroundStreamCleaner:
+    """
+    Incremental version of clean_background_response for streamed responses.
+
+    The response is scanned once, front to back, so the streamed text adds
+    up to the batch result at a cost linear in its length. Output is held
+    back while the start of the background is still unknown: until the
+    first <h4>, and until </think> if the response opens with <think> or
+    wait_for_think is set. Reasoning models served with a chat template
+    that adds the opening <think> only send the closing tag, and their
+    reasoning often quotes the prompt's <h4> headings. Trailing whitespace
+    and a tail that could still grow into a marker are also held.
+
+    Args:
+        wait_for_think (bool): Hold everything until </think> even without
+        an opening tag, defaults to the LLM_THINK_TAGS setting.
+    """
+    THINK_END = '</think>'
+    HTML_FENCE = '```html'
+    FENCE = '```'
+    MARKERS = (THINK_END, HTML_FENCE)
+
+    def __init__(self, wait_for_think=None):
+        if wait_for_think is None:
+            wait_for_think = getattr(settings, 'LLM_THINK_TAGS', False)
+        self.wait_for_think = wait_for_think
+        self.text = ''
+        # Index of the first <h4>, and whether </think> has arrived
+        self.h4 = -1
+        self.think_ended = False
+        # Start of the background in text, how far markers have been
+        # scanned, the closing fence, and how far the background was sent
+        self.start = None
+        self.scanned = 0
+        self.fence = None
+        # Sent text is text[sent_from:sent_to], sent_to is None until the
+        # current start is known to repeat it
+        self.sent_from = self.sent_to_before = 0
+        self.sent_to = None
+        self.finished = False
+
+    def feed(self, chunk):
+        """Add a chunk of model output and return the text that is safe to emit"""
+        if self.finished:
+            return ''
+        searched = max(len(self.text) - len(self.THINK_END) + 1, 0)
+        self.text += chunk
+
+        if self.start is None:
+            if self.h4 < 0:
+                self.h4 = self.text.find('<h4>', max(searched - 1, 0))
+            if not self.think_ended:
+                self.think_ended = self.text.find(self.THINK_END, searched) >= 0
+            if self.h4 < 0:
+                return ''
+            if not self.think_ended and (self.wait_for_think or self.text.lstrip().startswith('<think>')):
+                return ''
+            self.start = self.scanned = self.h4
+        return self._advance(len(self.text) - self._partial_marker())
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        if self.finished:
+            return ''
+        if self.start is None:
+            self.finished = True
+            return clean_background_response(self.text)
+        output = self._advance(len(self.text))
+        self.finished = True
+        return output
+
+    def _partial_marker(self):
+        """Length of the longest tail that is the start of a marker"""
+        for size in range(max(len(marker) for marker in self.MARKERS) - 1, 0, -1):
+            tail = self.text[-size:]
+            if any(marker.startswith(tail) for marker in self.MARKERS):
+                return size
+        return 0
+
+    def _advance(self, end):
+        """Scan text up to end for markers and return the background not sent yet"""
+        text = self.text
+        # Like the batch cleaner, the background starts after the last
+        # </think>, then after the last ```html, and ends at the next ```
+        think = text.rfind(self.THINK_END, self.scanned, end)
+        start = think + len(self.THINK_END) if think >= 0 else None
+        html = text.rfind(self.HTML_FENCE, self.scanned if start is None else start, end)
+        if html >= 0:
+            start = html + len(self.HTML_FENCE)
+        if start is not None:
+            # Sent text can't be taken back, so streaming only continues
+            # if the new start repeats it
+            self.start, self.fence, self.sent_to = start, None, None
+        if self.fence is None:
+            # A fence may start before end and run into the held tail
+            fence = text.find(self.FENCE, max(self.start, self.scanned))
+            self.fence = fence if 0 <= fence < end else None
+        self.scanned = end
+
+        # Text after the fence is still scanned, a later marker restarts the background
+        return self._send(end if self.fence is None else self.fence)
+
+    def _send(self, end):
+        """Background from the last sent position up to end, without trailing whitespace"""
+        text = self.text
+        if self.sent_to is None:
+            while self.start < end and text[self.start].isspace():
+                self.start += 1
+            sent = self.sent_to_before - self.sent_from
+            if self.start == end or end - self.start < sent:
+                return ''
+            if text[self.start:self.start + sent] != text[self.sent_from:self.sent_to_before]:
+                return ''
+            self.sent_from = self.start
+            self.sent_to = self.sent_to_before = self.start + sent
+        content = text[self.sent_to:end].rstrip()
+        self.sent_to += len(content)
+        self.sent_to_before = self.sent_to
+        return content
+
+
+def generate_club_background(club):
+    client = get_llm_client()
     
-    return cleanResponse
+    with llm_slot():
+        response = client.chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=[{"role": "user", "content": generate_club_history_prompt(club)}],
+            stream=False
+        )
+    return clean_background_response(response.choices[0].message.content)
 
-def generate_all():
-    data_dir = os.path.join(settings.BASE_DIR, 'storytracker/data')
+def stream_club_background(club):
+    """Yields cleaned chunks of the club background as the model produces them"""
+    client = get_llm_client()
     
+    # The slot is held until the stream ends or the client disconnects
+    with llm_slot():
+        response = client.chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=[{"role": "user", "content": generate_club_history_prompt(club)}],
+            stream=True
+        )
+        cleaner = BackgroundStreamCleaner()
+        try:
+            for event in response:
+                if not event.choices:
+                    continue
+                text = cleaner.feed(event.choices[0].delta.content or '')
+                if text:
+                    yield text
+        finally:
+            response.close()
+    text = cleaner.flush()
+    if text:
+        yield text
+
+def get_club_background(club):
+    """Returns a cached background for the club, generating and caching one if needed"""
+    prompt_hash = get_prompt_hash()
+    background = get_cached_background(club.id, prompt_hash, settings.LLM_MODEL)
+    if background is None:
+        background = generate_club_background(club.name)
+        store_background(club.id, prompt_hash, settings.LLM_MODEL, background)
+    return background
+
+def stream_club_background_cached(club):
+    """Like stream_club_background, but serves and fills the background cache"""
+    prompt_hash = get_prompt_hash()
+    background = get_cached_background(club.id, prompt_hash, settings.LLM_MODEL)
+    if background is not None:
+        yield background
+        return
+
+    chunks = []
+    for chunk in stream_club_background(club.name):
+        chunks.append(chunk)
+        yield chunk
+    store_background(club.id, prompt_hash, settings.LLM_MODEL, ''.join(chunks).strip())
+
+def generate_all(include_background=True, weight_by=None):
+    """
+    Picks a random club, formation and challenge and writes the club background.
+
+    With include_background=False the background is left empty so it can be
+    streamed separately with stream_club_background_cached. weight_by is
+    passed on to get_random_club_from_db.
+    """
     # Get a random club from the database
-    club_obj = get_random_club_from_db()
+    club_obj = get_random_club_from_db(weight_by)
     club_name = club_obj.name if isinstance(club_obj, Club) else club_obj
     
+    background = ''
+    if include_background:
+        # Only real clubs can be cached, fall back to a direct call otherwise
+        if isinstance(club_obj, Club):
+            background = get_club_background(club_obj)
+        else:
+            background = generate_club_background(club_name)
+    
     return {
         'club': club_name,
         'club_id': getattr(club_obj, 'id', None),  # Store club ID for later reference
-        'formation': get_random_item(os.path.join(data_dir, 'fifaFormations.txt')),
-        'challenge': get_random_item(os.path.join(data_dir, 'fifaChallenges.txt')),
-        'background': generate_club_background(club_name)
-    }
\ No newline at end of file
+        'formation': get_random_item(get_data_path(FORMATIONS_FILE)),
+        'challenge': get_random_item(get_data_path(CHALLENGES_FILE)),
+        'background': background
+    }
+def generate_all_streamed(on_update, weight_by=None):
+    """
+    Like generate_all, but reports the story while it is being written.
+
+    on_update(data) is called as soon as the club, formation and challenge
+    are picked, then with the background written so far at most every
+    STORY_JOB_UPDATE_INTERVAL seconds. Returns the finished story.
+    """
+    data = generate_all(include_background=False, weight_by=weight_by)
+    on_update(data)
+
+    club = Club.objects.filter(pk=data['club_id']).first() if data['club_id'] else None
+    if club is None:
+        data['background'] = generate_club_background(data['club'])
+        return data
+
+    interval = getattr(settings, 'STORY_JOB_UPDATE_INTERVAL', 0.5)
+    last_update = time.monotonic()
+    chunks = []
+    for chunk in stream_club_background_cached(club):
+        chunks.append(chunk)
+        if time.monotonic() - last_update >= interval:
+            on_update({**data, 'background': ''.join(chunks)})
+            last_update = time.monotonic()
+    data['background'] = ''.join(chunks)
+    return data
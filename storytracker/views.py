@@ -1,7 +1,10 @@
+import hashlib
 import json
+import time
+from functools import lru_cache
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.forms import UserCreationForm
-from django.http import HttpResponseForbidden, JsonResponse, HttpResponse, HttpRequest
+from django.http import HttpResponseForbidden, JsonResponse, HttpResponse, HttpRequest, StreamingHttpResponse
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -9,13 +12,28 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import logout
 import os
-from .models import Player, PlayerStats, Season, Story, Club
-from .utils.story_generator import generate_all
+from .models import Player, PlayerStats, Season, Story, StorySummary, Club, CompetitionWinner, AwardWinner
+from .utils.story_generator import generate_all, generate_all_streamed
+from .utils.job_queue import submit_job, get_job, report_progress, DONE, FAILED
+from .utils import player_index, squad_cache
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
 from .models import Transfer
 from django.core.exceptions import ValidationError
 import re
 from django.urls import reverse
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, Sum
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+STORIES_PER_PAGE = 20
+SQUAD_PAGE_SIZE = 50
+MAX_SQUAD_PAGE_SIZE = 200
+MAX_SEARCH_RESULTS = 25
+LEADERBOARD_PAGE_SIZE = 20
 
 def index(request: HttpRequest) -> HttpResponse:
     """
@@ -42,16 +60,125 @@ def generate_story(request: HttpRequest) -> JsonResponse:
     if request.method == "POST":
         data = generate_all()  # Generate new story data
 
+        return JsonResponse({"success": True, **_story_payload(data)})
+
+    return JsonResponse({"error": "Invalid request"}, status=400)
+
+def _story_payload(data: dict) -> dict:
+    """Picks the generated story fields that are sent to the browser."""
+    return {
+        "club": data['club'],
+        "formation": data['formation'],
+        "challenge": data['challenge'],
+        "background": data['background']
+    }
+
+def generate_story_job(request: HttpRequest) -> JsonResponse:
+    """
+    Queues story generation on the background worker pool and returns at once.
+    
+    Args:
+        request (HttpRequest): The request object.
+    
+    Returns:
+        JsonResponse: A JSON response with the job id and the URL to poll for the result.
+    """
+    if request.method == "POST":
+        # The worker publishes the story and the background as it is written
+        job_id = submit_job(generate_all_streamed, report_progress)
+
         return JsonResponse({
             "success": True,
-            "club": data['club'],
-            "formation": data['formation'],
-            "challenge": data['challenge'],
-            "background": data['background']
-        })
+            "job_id": job_id,
+            "status_url": reverse('generate_story_status', kwargs={'job_id': job_id}),
+            "stream_url": reverse('generate_story_stream', kwargs={'job_id': job_id})
+        }, status=202)
 
     return JsonResponse({"error": "Invalid request"}, status=400)
 
+def generate_story_status(request: HttpRequest, job_id: str) -> JsonResponse:
+    """
+    Reports the state of a queued story generation job.
+    
+    Args:
+        request (HttpRequest): The request object.
+        job_id (str): The id returned by generate_story_job.
+    
+    Returns:
+        JsonResponse: The job status, plus the story data written so far.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    if job['status'] == DONE:
+        return JsonResponse({"success": True, "status": DONE, **_story_payload(job['result'])})
+
+    if job['status'] == FAILED:
+        return JsonResponse({"success": False, "status": FAILED, "error": job['error']}, status=500)
+
+    if job.get('result'):
+        return JsonResponse({"success": True, "status": job['status'], **_story_payload(job['result'])})
+
+    return JsonResponse({"success": True, "status": job['status']})
+
+def generate_story_stream(request: HttpRequest, job_id: str) -> HttpResponse:
+    """
+    Relays a story generation job to the browser as server-sent events.
+    
+    The job worker does the generation, this view only reads the job's
+    shared state, so it works from any worker process. It still holds a
+    connection until the job ends, so the page itself polls
+    generate_story_status instead and this stream is for clients that
+    want pushed updates.
+    
+    Sends a "story" event with the club, formation and challenge, then
+    messages with JSON encoded chunks of background HTML, and finally a
+    "done" event (or an "error" event if the job fails).
+    
+    Args:
+        request (HttpRequest): The request object.
+        job_id (str): The id returned by generate_story_job.
+    
+    Returns:
+        HttpResponse: An event stream, or a JSON error if the job is unknown.
+    """
+    if get_job(job_id) is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    def events():
+        sent_story = False
+        sent = ''
+        deadline = time.monotonic() + getattr(settings, 'STORY_JOB_TTL', 600)
+        while time.monotonic() < deadline:
+            job = get_job(job_id)
+            if job is None or job['status'] == FAILED:
+                error = job['error'] if job else "Job expired"
+                yield f"event: error\ndata: {json.dumps({'error': error})}\n\n"
+                return
+            
+            result = job.get('result')
+            if result:
+                if not sent_story:
+                    story = {key: value for key, value in _story_payload(result).items() if key != 'background'}
+                    yield f"event: story\ndata: {json.dumps(story)}\n\n"
+                    sent_story = True
+                background = result['background']
+                if len(background) > len(sent):
+                    yield f"data: {json.dumps({'html': background[len(sent):]})}\n\n"
+                    sent = background
+            
+            if job['status'] == DONE:
+                yield "event: done\ndata: {}\n\n"
+                return
+            time.sleep(getattr(settings, 'STORY_JOB_UPDATE_INTERVAL', 0.5))
+        yield f"event: error\ndata: {json.dumps({'error': 'Job timed out'})}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
 def register(request: HttpRequest) -> HttpResponse:
     """
     Handles user registration.
@@ -184,29 +311,36 @@ def my_stories(request: HttpRequest) -> HttpResponse:
     Returns:
         HttpResponse: The rendered my stories page.
     """
-    # Get all stories for the current user, ordered by most recently updated
-    stories = Story.objects.filter(user=request.user).order_by('-updated_at')
+    # Get all stories for the current user, ordered by most recently updated.
+    # The club, season count and current season are loaded with the page,
+    # so the number of queries doesn't grow with the number of stories.
+    stories = (
+        Story.objects.filter(user=request.user)
+        .select_related('club')
+        .annotate(total_seasons=Count('seasons'))
+        .prefetch_related(Prefetch(
+            'seasons',
+            queryset=Season.objects.filter(is_current=True),
+            to_attr='current_seasons'
+        ))
+        .order_by('-updated_at')
+    )
+    
+    paginator = Paginator(stories, STORIES_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
     
     # Create a context with additional statistics
-    stories_with_stats = []
-    for story in stories:
-        # Get current season
-        current_season = story.seasons.filter(is_current=True).first()
-        
-        # Get basic stats
-        total_seasons = story.seasons.count()
-        
-        # You could expand this to include more stats if desired
-        stories_with_stats.append({
-            'story': story,
-            'current_season': current_season,
-            'total_seasons': total_seasons,
-            'club_logo': story.club.club_logo_small_url if story.club and hasattr(story.club, 'club_logo_small_url') else None
-        })
+    stories_with_stats = [{
+        'story': story,
+        'current_season': story.current_seasons[0] if story.current_seasons else None,
+        'total_seasons': story.total_seasons,
+        'club_logo': story.club.club_logo_small_url
+    } for story in page]
     
     context = {
         'stories': stories_with_stats,
-        'total_stories': len(stories_with_stats)
+        'page': page,
+        'total_stories': paginator.count
     }
     
     return render(request, 'storytracker/my_stories.html', context)
@@ -319,43 +453,108 @@ def delete_player_stat(request):
 
 @login_required
 def api_club_players(request, club_id):
-    """API endpoint to get players for a specific club"""
+    """
+    API endpoint to get a page of players for a specific club.
+
+    Query params:
+        position: Only players who can play this position, e.g. 'ST'.
+        cursor: next_cursor from the previous page.
+        limit: Players per page, up to MAX_SQUAD_PAGE_SIZE.
+    """
     club = get_object_or_404(Club, id=club_id)
-    players = Player.objects.filter(club=club).order_by('-overall')
     
-    player_data = [{
-        'id': player.id,
-        'name': player.name,
-        'overall': player.overall,
-        'positions': player.positions
-    } for player in players]
+    position = request.GET.get('position') or None
+    try:
+        limit = min(max(int(request.GET.get('limit', SQUAD_PAGE_SIZE)), 1), MAX_SQUAD_PAGE_SIZE)
+        players, next_cursor = squad_cache.get_squad_page(
+            club.id, position, request.GET.get('cursor'), limit
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'}, status=400)
+    
+    return JsonResponse({'players': players, 'next_cursor': next_cursor})
+
+@login_required
+def api_player_search(request):
+    """
+    Player autocomplete, matching every word of ?q= as a name prefix.
+
+    Matching ignores case and accents. ?club= ranks that club's players
+    first and ?limit= caps the results. Returns player ids so write
+    endpoints never have to look players up by name.
+    """
+    query = request.GET.get('q', '').strip()
+    if len(query) < 2:
+        return JsonResponse({'players': []})
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_SEARCH_RESULTS)
+        club_id = int(request.GET['club']) if request.GET.get('club') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid club or limit'}, status=400)
     
-    return JsonResponse({'players': player_data})
+    return JsonResponse({'players': player_index.search(query, limit, club_id)})
+
+# Columns the season player-stats API can return, response field -> lookup
+PLAYER_STAT_FIELDS = {
+    'id': 'id',
+    'player_id': 'player_id',
+    'player_name': 'player__name',
+    'overall_rating': 'overall_rating',
+    'appearances': 'appearances',
+    'goals': 'goals',
+    'assists': 'assists',
+    'clean_sheets': 'clean_sheets',
+    'yellow_cards': 'yellow_cards',
+    'red_cards': 'red_cards',
+    'average_rating': 'average_rating',
+}
+
+def _order_field(term):
+    """Field an order term sorts by, a single leading '-' means descending"""
+    return term[1:] if term.startswith('-') else term
+
+def _player_stat_rows(player_stats, fields, order=()):
+    """
+    Serializes a PlayerStats queryset with one joined query straight to
+    tuples, no model instances. Fields outside PLAYER_STAT_FIELDS are used
+    as plain lookups.
+    """
+    rows = (
+        player_stats
+        .order_by(*[('-' if o.startswith('-') else '') + PLAYER_STAT_FIELDS[_order_field(o)] for o in order])
+        .values_list(*[PLAYER_STAT_FIELDS.get(field, field) for field in fields])
+    )
+    
+    stats_data = [dict(zip(fields, row)) for row in rows]
+    if 'average_rating' in fields:
+        for stat in stats_data:
+            stat['average_rating'] = float(stat['average_rating'])
+    return stats_data
 
 @login_required
 def api_season_player_stats(request, season_id):
-    """API endpoint to get player stats for a specific season"""
-    season = get_object_or_404(Season, id=season_id)
+    """
+    API endpoint to get player stats for a specific season.
+
+    Optional query parameters:
+        fields: Comma separated subset of PLAYER_STAT_FIELDS to return.
+        order: Comma separated fields to sort by, prefix with '-' for descending.
+    """
+    season = get_object_or_404(Season.objects.select_related('story'), id=season_id)
     
     # Check if the user is authorized to view this data
-    if season.story.user != request.user and not season.story.is_public:
+    if season.story.user_id != request.user.id and not season.story.is_public:
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    player_stats = PlayerStats.objects.filter(season=season)
-    
-    stats_data = [{
-        'id': stat.id,
-        'player_id': stat.player.id,
-        'player_name': stat.player.name,
-        'overall_rating': stat.overall_rating,
-        'appearances': stat.appearances,
-        'goals': stat.goals,
-        'assists': stat.assists,
-        'clean_sheets': stat.clean_sheets,
-        'yellow_cards': stat.yellow_cards,
-        'red_cards': stat.red_cards,
-        'average_rating': float(stat.average_rating)
-    } for stat in player_stats]
+    fields = request.GET.get('fields')
+    fields = fields.split(',') if fields else list(PLAYER_STAT_FIELDS)
+    order = request.GET.get('order')
+    order = order.split(',') if order else []
+    if any(field not in PLAYER_STAT_FIELDS for field in fields + [_order_field(o) for o in order]):
+        return JsonResponse({'error': 'Invalid field'}, status=400)
+    
+    stats_data = _player_stat_rows(PlayerStats.objects.filter(season=season), fields, order)
     
     return JsonResponse({'player_stats': stats_data})
 
@@ -428,6 +627,92 @@ def update_player_stat(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
+# PlayerStats fields that can be edited from the season table
+EDITABLE_STAT_FIELDS = (
+    'overall_rating',
+    'appearances',
+    'goals',
+    'assists',
+    'clean_sheets',
+    'red_cards',
+    'yellow_cards',
+    'average_rating',
+)
+
+@login_required
+def batch_update_player_stats(request):
+    """
+    Update many player stat fields in one request.
+
+    Expects {"edits": [{"stat_id", "field", "value"}, ...]}. Every edit is
+    validated against EDITABLE_STAT_FIELDS and the field's validators, then
+    all valid edits are written with one bulk_update in a transaction.
+    Returns a result per edit, in request order.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    
+    try:
+        edits = json.loads(request.body).get('edits')
+    except (ValueError, AttributeError):
+        edits = None
+    if not isinstance(edits, list):
+        return JsonResponse({'success': False, 'error': 'Expected a list of edits'}, status=400)
+    
+    edits = [edit if isinstance(edit, dict) else {} for edit in edits]
+    
+    def valid_stat_id(stat_id):
+        # JSON true and false would otherwise pass as the ids 1 and 0
+        return isinstance(stat_id, int) and not isinstance(stat_id, bool)
+    
+    # One query for all rows, limited to stats the user owns
+    stat_ids = {edit.get('stat_id') for edit in edits if valid_stat_id(edit.get('stat_id'))}
+    stats = PlayerStats.objects.filter(id__in=stat_ids, story__user=request.user).in_bulk()
+    
+    results = []
+    changed = {}
+    changed_fields = set()
+    for edit in edits:
+        stat_id = edit.get('stat_id')
+        field_name = edit.get('field')
+        result = {'stat_id': stat_id, 'field': field_name, 'success': False}
+        results.append(result)
+        
+        if not valid_stat_id(stat_id):
+            result['error'] = 'Invalid stat_id'
+            continue
+        stat = stats.get(stat_id)
+        if stat is None:
+            result['error'] = 'Not found or permission denied'
+            continue
+        if not isinstance(field_name, str) or field_name not in EDITABLE_STAT_FIELDS:
+            result['error'] = 'Invalid field'
+            continue
+        
+        field = PlayerStats._meta.get_field(field_name)
+        try:
+            value = field.clean(edit.get('value'), stat)
+        except ValidationError as e:
+            result['error'] = '; '.join(e.messages)
+            continue
+        
+        setattr(stat, field_name, value)
+        changed[stat.id] = stat
+        changed_fields.add(field_name)
+        result['success'] = True
+    
+    if changed_fields:
+        with transaction.atomic():
+            PlayerStats.objects.bulk_update(list(changed.values()), sorted(changed_fields))
+            # bulk_update sends no signals, so refresh the story summaries here
+            for story_id in {stat.story_id for stat in changed.values()}:
+                StorySummary.refresh_on_commit(story_id)
+    
+    return JsonResponse({
+        'success': all(result['success'] for result in results),
+        'results': results
+    })
+
 @login_required
 def update_season_awards(request, slug):
     """Update season awards information"""
@@ -468,7 +753,7 @@ def add_transfer(request):
         try:
             data = json.loads(request.body)
             season_id = data.get('season_id')
-            player_name = data.get('player_name')
+            player_id = data.get('player_id')
             fee = data.get('fee')
             direction = data.get('direction')
             
@@ -480,11 +765,10 @@ def add_transfer(request):
             if story.user != request.user:
                 return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
             
-            # Find or create player
-            player, created = Player.objects.get_or_create(
-                name=player_name,
-                defaults={'club': story.club}
-            )
+            # Players are picked through the search endpoint, which returns ids
+            if not player_id:
+                return JsonResponse({'success': False, 'error': 'Select a player'}, status=400)
+            player = get_object_or_404(Player, id=player_id)
             
             # Create transfer record
             if direction == 'in':
@@ -568,83 +852,335 @@ def get_season_data(request, season_id):
         }
     })
 
+# Award fields the story detail UI expects, blank when nobody has won them
+AWARD_KEYS = (
+    'la_liga_winner',
+    'serie_a_winner',
+    'bundesliga_winner',
+    'ligue_1_winner',
+    'premier_league_winner',
+    'champions_league_winner',
+    'europa_league_winner',
+    'conference_league_winner',
+    'super_cup_winner',
+    'balon_dor_winner',
+    'golden_boy_winner',
+)
+
+@lru_cache(maxsize=None)
+def _competition_award_key(name):
+    return name.lower().replace(' ', '_') + '_winner'
+
+@lru_cache(maxsize=None)
+def _individual_award_key(name):
+    return name.lower().replace(' ', '_').replace("'", '') + '_winner'
+
+def _awards_by_season(season_ids):
+    """
+    Builds the awards dict for each season with one joined query per winner table.
+
+    Args:
+        season_ids (list): Ids of the seasons to collect awards for.
+
+    Returns:
+        dict: season id -> awards dict.
+    """
+    awards = {season_id: dict.fromkeys(AWARD_KEYS, '') for season_id in season_ids}
+    
+    competition_winners = CompetitionWinner.objects.filter(season_id__in=season_ids).values_list(
+        'season_id', 'competition__name', 'winner__name'
+    )
+    for season_id, competition_name, winner_name in competition_winners:
+        awards[season_id][_competition_award_key(competition_name)] = winner_name
+    
+    award_winners = AwardWinner.objects.filter(season_id__in=season_ids).values_list(
+        'season_id', 'award__name', 'player__name'
+    )
+    for season_id, award_name, player_name in award_winners:
+        awards[season_id][_individual_award_key(award_name)] = player_name
+    
+    return awards
+
 @login_required
 def get_season_awards(request, season_id):
     """Get awards data for a season"""
-    season = get_object_or_404(Season, id=season_id)
+    season = get_object_or_404(Season.objects.select_related('story'), id=season_id)
     story = season.story
     
     # Check permission
-    if story.user != request.user and not story.is_public:
+    if story.user_id != request.user.id and not story.is_public:
         return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
     
-    # Get competition winners
-    competition_winners = CompetitionWinner.objects.filter(season=season)
-    
-    # Transform to expected format
-    awards = {
-        'la_liga_winner': '',
-        'serie_a_winner': '',
-        'bundesliga_winner': '',
-        'ligue_1_winner': '',
-        'premier_league_winner': '',
-        'champions_league_winner': '',
-        'europa_league_winner': '',
-        'conference_league_winner': '',
-        'super_cup_winner': '',
-        'balon_dor_winner': '',
-        'golden_boy_winner': ''
-    }
+    return JsonResponse({
+        'success': True,
+        'awards': _awards_by_season([season.id])[season.id]
+    })
+
+@login_required
+def get_story_awards(request, slug):
+    """Get awards data for every season of a story in one request"""
+    story = get_object_or_404(Story, slug=slug)
+    
+    # Check permission
+    if story.user_id != request.user.id and not story.is_public:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
     
-    # Populate with actual data
-    for winner in competition_winners:
-        comp_name = winner.competition.name.lower().replace(' ', '_')
-        awards[f'{comp_name}_winner'] = winner.winner.name
+    return JsonResponse({
+        'success': True,
+        'awards': _awards_by_season(list(story.seasons.values_list('id', flat=True)))
+    })
+
+def public_leaderboard(request):
+    """
+    Public stories ranked by trophies, then total goals, from StorySummary.
+
+    Pages with a cursor (next_cursor of the previous page) rather than an
+    offset, so every page is one index range scan of LEADERBOARD_PAGE_SIZE
+    rows however many stories come before it.
+    """
+    summaries = StorySummary.objects.filter(is_public=True).select_related(
+        'story__club', 'story__user', 'top_scorer'
+    ).order_by('-trophies', '-total_goals', '-story_id')
+    
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            trophies, total_goals, story_id = (int(part) for part in cursor.split(':'))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        # Rows after the cursor in the index order, the trophies bound lets
+        # the scan start at the cursor instead of the top of the index
+        summaries = summaries.filter(trophies__lte=trophies).filter(
+            Q(trophies__lt=trophies)
+            | Q(trophies=trophies, total_goals__lt=total_goals)
+            | Q(trophies=trophies, total_goals=total_goals, story_id__lt=story_id)
+        )
     
-    # Get individual awards
-    award_winners = AwardWinner.objects.filter(season=season)
-    for award in award_winners:
-        award_name = award.award.name.lower().replace(' ', '_').replace("'", '')
-        awards[f'{award_name}_winner'] = award.player.name
+    page = list(summaries[:LEADERBOARD_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > LEADERBOARD_PAGE_SIZE:
+        page = page[:LEADERBOARD_PAGE_SIZE]
+        last = page[-1]
+        next_cursor = f"{last.trophies}:{last.total_goals}:{last.story_id}"
     
     return JsonResponse({
         'success': True,
-        'awards': awards
+        'stories': [{
+            'name': summary.story.name,
+            'slug': summary.story.slug,
+            'user': summary.story.user.username,
+            'club': summary.story.club.name,
+            'seasons': summary.total_seasons,
+            'trophies': summary.trophies,
+            'transfers': summary.transfers,
+            'total_goals': summary.total_goals,
+            'top_scorer': summary.top_scorer.name if summary.top_scorer else None,
+            'top_scorer_goals': summary.top_scorer_goals
+        } for summary in page],
+        'next_cursor': next_cursor
     })
 
+# Sort orders of the player leaderboard, param value -> order_by fields
+LEADERBOARD_ORDERS = {
+    'rating': ('-weighted_rating', '-total_appearances', 'player_id'),
+    'goals': ('-total_goals', '-weighted_rating', 'player_id'),
+    'assists': ('-total_assists', '-weighted_rating', 'player_id'),
+    'appearances': ('-total_appearances', '-weighted_rating', 'player_id'),
+}
+
+@login_required
+def get_story_leaderboard(request, slug):
+    """
+    Best players across every season of a story, from one grouped query.
+
+    Query params:
+        order: One of LEADERBOARD_ORDERS, 'rating' by default, which uses
+        the appearance-weighted average rating.
+        min_appearances: Leave out players with fewer total appearances.
+        limit: Players returned, up to MAX_SEARCH_RESULTS.
+    """
+    story = get_object_or_404(Story, slug=slug)
+    
+    # Check permission
+    if story.user_id != request.user.id and not story.is_public:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    order = LEADERBOARD_ORDERS.get(request.GET.get('order', 'rating'))
+    try:
+        min_appearances = int(request.GET.get('min_appearances', 0))
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        order = None
+    if order is None:
+        return JsonResponse({'success': False, 'error': 'Invalid order, limit or min_appearances'}, status=400)
+    
+    players = story.player_stats.leaderboard().filter(
+        total_appearances__gte=min_appearances
+    ).order_by(*order)[:limit]
+    
+    return JsonResponse({
+        'success': True,
+        'players': [{
+            'player_id': row['player_id'],
+            'player_name': row['player__name'],
+            'appearances': row['total_appearances'],
+            'goals': row['total_goals'],
+            'assists': row['total_assists'],
+            'average_rating': float(row['weighted_rating'])
+        } for row in players]
+    })
+
+def _transfers_by_season(transfers, club_id, season_ids):
+    """
+    Splits a Transfer queryset into transfers in and out of the club, per season.
+
+    The player and both clubs are resolved in the same query.
+
+    Returns:
+        dict: season id -> {'transfers_in': [...], 'transfers_out': [...]}.
+    """
+    by_season = {season_id: {'transfers_in': [], 'transfers_out': []} for season_id in season_ids}
+    rows = transfers.order_by('transfer_date', 'id').values_list(
+        'season_id', 'id', 'player__name', 'from_club_id', 'from_club__name',
+        'to_club_id', 'to_club__name', 'fee', 'transfer_date'
+    )
+    for season_id, transfer_id, player_name, from_id, from_name, to_id, to_name, fee, transfer_date in rows:
+        if to_id == club_id:
+            by_season[season_id]['transfers_in'].append({
+                'id': transfer_id,
+                'player_name': player_name,
+                'from_club': from_name,
+                'fee': fee,
+                'date': transfer_date.strftime('%Y-%m-%d')
+            })
+        if from_id == club_id:
+            by_season[season_id]['transfers_out'].append({
+                'id': transfer_id,
+                'player_name': player_name,
+                'to_club': to_name,
+                'fee': fee,
+                'date': transfer_date.strftime('%Y-%m-%d')
+            })
+    return by_season
+
+def _etag_matches(request, etag):
+    """
+    Weak comparison of etag with the request's If-None-Match, as RFC 7232
+    requires for GET. Gzipped responses send their ETag back as W/"...",
+    which an exact match would never accept.
+    """
+    client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in client_etags:
+        return True
+    return etag in (client_etag[2:] if client_etag.startswith('W/') else client_etag for client_etag in client_etags)
+
 @login_required
 def get_season_transfers(request, season_id):
-    """Get transfers for a season"""
-    season = get_object_or_404(Season, id=season_id)
+    """
+    Get transfers for a season, with totals computed in the database.
+
+    The ETag is a digest of the response body, so renaming a player or club
+    or editing a fee changes it and a client with an unchanged copy gets a
+    304.
+    """
+    season = get_object_or_404(Season.objects.select_related('story'), id=season_id)
     story = season.story
     
     # Check permission
-    if story.user != request.user and not story.is_public:
+    if story.user_id != request.user.id and not story.is_public:
         return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
     
-    # Get transfers
-    transfers_in = Transfer.objects.filter(season=season, to_club=story.club)
-    transfers_out = Transfer.objects.filter(season=season, from_club=story.club)
-    
-    # Format transfers
-    transfers_in_data = [{
-        'id': t.id,
-        'player_name': t.player.name,
-        'from_club': t.from_club.name,
-        'fee': t.fee,
-        'date': t.transfer_date.strftime('%Y-%m-%d')
-    } for t in transfers_in]
-    
-    transfers_out_data = [{
-        'id': t.id,
-        'player_name': t.player.name,
-        'to_club': t.to_club.name,
-        'fee': t.fee,
-        'date': t.transfer_date.strftime('%Y-%m-%d')
-    } for t in transfers_out]
+    club_id = story.club_id
+    transfers = Transfer.objects.filter(season=season).filter(Q(to_club_id=club_id) | Q(from_club_id=club_id))
     
-    return JsonResponse({
+    totals = transfers.aggregate(
+        count_in=Count('id', filter=Q(to_club_id=club_id)),
+        count_out=Count('id', filter=Q(from_club_id=club_id)),
+        spent=Sum('fee', filter=Q(to_club_id=club_id)),
+        received=Sum('fee', filter=Q(from_club_id=club_id)),
+    )
+    season_transfers = _transfers_by_season(transfers, club_id, [season.id])[season.id]
+    
+    spent = totals['spent'] or 0
+    received = totals['received'] or 0
+    response = JsonResponse({
         'success': True,
-        'transfers_in': transfers_in_data,
-        'transfers_out': transfers_out_data
-    })
\ No newline at end of file
+        'transfers_in': season_transfers['transfers_in'],
+        'transfers_out': season_transfers['transfers_out'],
+        'totals': {
+            'count_in': totals['count_in'],
+            'count_out': totals['count_out'],
+            'spent': spent,
+            'received': received,
+            'net_spend': spent - received
+        }
+    })
+    
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    if _etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    response['ETag'] = etag
+    return response
+
+@login_required
+@gzip_page
+@cache_control(private=True, no_cache=True)
+def get_story_dashboard(request, slug):
+    """
+    Everything the story detail page shows, for all seasons of a story.
+
+    Returns season metadata, player stats, transfers and awards per season,
+    built from a fixed handful of queries. The squad is not included, the
+    page finds players through the player search endpoint. Optional
+    from/to query parameters limit the seasons by season number. The
+    response is gzipped and carries an ETag so unchanged data revalidates
+    with a 304.
+    """
+    story = get_object_or_404(Story, slug=slug)
+    
+    # Check permission
+    if story.user_id != request.user.id and not story.is_public:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    seasons = story.seasons.all()
+    try:
+        if request.GET.get('from'):
+            seasons = seasons.filter(season_number__gte=int(request.GET['from']))
+        if request.GET.get('to'):
+            seasons = seasons.filter(season_number__lte=int(request.GET['to']))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid season range'}, status=400)
+    
+    seasons = list(seasons.values('id', 'name', 'season_number', 'is_current'))
+    season_ids = [season['id'] for season in seasons]
+    
+    stats_by_season = {season_id: [] for season_id in season_ids}
+    stat_fields = ['season_id'] + list(PLAYER_STAT_FIELDS)
+    for stat in _player_stat_rows(PlayerStats.objects.filter(season_id__in=season_ids), stat_fields):
+        stats_by_season[stat.pop('season_id')].append(stat)
+    
+    club_transfers = Transfer.objects.filter(season_id__in=season_ids).filter(
+        Q(to_club_id=story.club_id) | Q(from_club_id=story.club_id)
+    )
+    transfers = _transfers_by_season(club_transfers, story.club_id, season_ids)
+    awards = _awards_by_season(season_ids)
+    
+    response = JsonResponse({
+        'success': True,
+        'story': {'id': story.id, 'name': story.name, 'club_id': story.club_id},
+        'seasons': [{
+            'id': season['id'],
+            'name': season['name'],
+            'number': season['season_number'],
+            'is_current': season['is_current'],
+            'player_stats': stats_by_season[season['id']],
+            **transfers[season['id']],
+            'awards': awards[season['id']]
+        } for season in seasons]
+    })
+    
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    if _etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    response['ETag'] = etag
+    return response